@@ -0,0 +1,29 @@
+"""Loading of ``.workflow-config.yaml``."""
+
+from __future__ import annotations
+from pathlib import Path
+
+DEFAULT_CONFIG = Path('.workflow-config.yaml')
+
+# Deprecated key -> current key
+_RENAMED = {
+    "profile": "placeholder_values",
+    "template": "template_source_dir",
+    "temp_dir": "working_directory",
+    "overlay_dir": "company_only_files",
+}
+
+
+def load_config(path: Path = DEFAULT_CONFIG) -> dict:
+    # Imported here so scripts that only read an optional config still run
+    # without PyYAML when there is none
+    import yaml
+
+    config = yaml.safe_load(open(path))
+
+    for old, new in _RENAMED.items():
+        if old in config and new not in config:
+            config[new] = config[old]
+            print(f"Warning: '{old}' is deprecated, use '{new}' instead")
+
+    return config
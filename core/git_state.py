@@ -0,0 +1,159 @@
+"""Batched collection of git repository state.
+
+Workflow steps used to start a separate ``git`` process for every question
+(branch, commit, status, tracked files). :func:`collect_git_state` answers all
+of them with one ``git status --porcelain=v2 --branch`` and one
+``git ls-files -s`` call so the result can be shared across a whole workflow
+invocation.
+"""
+
+from __future__ import annotations
+import os
+import subprocess
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def _find_toplevel(root: Path) -> Optional[Path]:
+    """Return the nearest directory at or above ``root`` containing ``.git``."""
+    current = Path(os.path.abspath(root))
+    for candidate in (current, *current.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return None
+
+
+def _git(toplevel: Path, *args: str) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=toplevel,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            text=True,
+        )
+        return result.stdout
+    except Exception:
+        return None
+
+
+class GitState:
+    """Snapshot of a repository's branch, commit, status and index."""
+
+    def __init__(
+        self,
+        toplevel: Path,
+        branch: str,
+        commit: str,
+        entries: List[Tuple[str, str]],
+        tracked: Dict[str, Tuple[str, str]],
+    ) -> None:
+        self.toplevel = toplevel
+        self.branch = branch
+        self.commit = commit
+        # (XY, path) pairs from ``git status``; untracked files use ``??``
+        self.entries = entries
+        # path -> (mode, blob id) from ``git ls-files -s``
+        self.tracked = tracked
+        self._sorted = sorted(tracked)
+
+    @property
+    def status(self) -> str:
+        """Status in the short ``XY path`` form, with ``.`` for unmodified."""
+        return "\n".join(f"{xy} {path}" for xy, path in self.entries)
+
+    @property
+    def dirty_files(self) -> List[str]:
+        """Paths with staged changes or not tracked at all."""
+        return [path for xy, path in self.entries if xy[0] != "."]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.entries)
+
+    def _relative(self, path: Path) -> Optional[str]:
+        rel = Path(os.path.relpath(os.path.abspath(path), self.toplevel)).as_posix()
+        if rel == ".." or rel.startswith("../"):
+            return None
+        return rel
+
+    def tracked_files(self, root: Path) -> List[str]:
+        """Return tracked paths below ``root``, relative to ``root``."""
+        rel = self._relative(root)
+        if rel is None:
+            return []
+        if rel == ".":
+            return list(self.tracked)
+        prefix = rel + "/"
+        return [p[len(prefix):] for p in self.tracked if p.startswith(prefix)]
+
+    def is_tracked(self, path: Path) -> bool:
+        """Return True if ``path`` or anything below it is tracked."""
+        rel = self._relative(path)
+        if rel is None:
+            return False
+        if rel == ".":
+            return bool(self.tracked)
+        if rel in self.tracked:
+            return True
+        idx = bisect_left(self._sorted, rel + "/")
+        return idx < len(self._sorted) and self._sorted[idx].startswith(rel + "/")
+
+
+def _parse_status(output: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+    branch = ""
+    commit = ""
+    entries: List[Tuple[str, str]] = []
+    records = output.split("\0")
+    # Field count before the path for ordinary, renamed and unmerged entries
+    fields = {"1": 8, "2": 9, "u": 10}
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        if record.startswith("# branch.oid "):
+            commit = record[len("# branch.oid "):]
+            if commit == "(initial)":
+                commit = ""
+        elif record.startswith("# branch.head "):
+            head = record[len("# branch.head "):]
+            branch = "HEAD" if head == "(detached)" else head
+        elif record[0] in fields:
+            parts = record.split(" ", fields[record[0]])
+            entries.append((parts[1], parts[-1]))
+            if record[0] == "2":
+                i += 1  # skip the original path of a rename
+        elif record[0] in "?!":
+            entries.append((record[0] * 2, record[2:]))
+    return branch, commit, entries
+
+
+def _parse_ls_files(output: str) -> Dict[str, Tuple[str, str]]:
+    tracked: Dict[str, Tuple[str, str]] = {}
+    for record in output.split("\0"):
+        if not record:
+            continue
+        info, path = record.split("\t", 1)
+        mode, blob, _stage = info.split()
+        tracked[path] = (mode, blob)
+    return tracked
+
+
+def collect_git_state(root: Path) -> Optional[GitState]:
+    """Collect git state for the repository containing ``root``.
+
+    Returns ``None`` when ``root`` is not inside a repository or git fails.
+    """
+    toplevel = _find_toplevel(root)
+    if toplevel is None:
+        return None
+    status = _git(toplevel, "status", "--porcelain=v2", "--branch", "-z")
+    staged = _git(toplevel, "ls-files", "-s", "-z")
+    if status is None or staged is None:
+        return None
+    branch, commit, entries = _parse_status(status)
+    return GitState(toplevel, branch, commit, entries, _parse_ls_files(staged))
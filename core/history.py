@@ -0,0 +1,160 @@
+"""Scan git history for sensitive content.
+
+:func:`cat_file_batch` streams object contents through one
+``git cat-file --batch`` process. :class:`HistoryScanner` uses it with
+``git rev-list --objects`` to scan every blob reachable from new commits
+exactly once. It keeps a checkpoint of the last scanned commit plus the
+findings for every blob it has seen, keyed by blob id. The checkpoint only
+advances past commits without findings, so a leak keeps being reported
+until it is removed from history.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .utils import is_binary_data
+
+# (text, label) -> report lines
+TextScanner = Callable[[str, str], List[str]]
+
+
+def cat_file_batch(toplevel: Path, object_ids: Sequence[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """Yield ``(object id, contents)`` for each id; contents is None if missing."""
+    proc = subprocess.Popen(
+        ["git", "cat-file", "--batch"],
+        cwd=toplevel,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # Feed ids from a thread so a full stdout pipe cannot deadlock us
+    def feed() -> None:
+        try:
+            for oid in object_ids:
+                proc.stdin.write(oid.encode() + b"\n")
+        except OSError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        while True:
+            header = proc.stdout.readline()
+            if not header:
+                break
+            parts = header.split()
+            if len(parts) < 3:
+                yield parts[0].decode(), None
+                continue
+            data = proc.stdout.read(int(parts[2]))
+            proc.stdout.read(1)  # trailing newline
+            yield parts[0].decode(), data
+    finally:
+        proc.stdout.close()
+        writer.join()
+        proc.wait()
+
+
+def _git(toplevel: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["git", *args], cwd=toplevel, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+
+class HistoryScanner:
+    """Scan the blobs of new commits, resuming from a checkpoint.
+
+    ``fingerprint`` identifies the scanner's configuration (patterns and
+    profile values). Cached findings from a different fingerprint are
+    discarded.
+    """
+
+    def __init__(self, toplevel: Path, scan: TextScanner, fingerprint: str, state_path: Path) -> None:
+        self.toplevel = Path(toplevel)
+        self.scan = scan
+        self.fingerprint = fingerprint
+        self.state_path = Path(state_path)
+        self.last_commit: Optional[str] = None
+        self.blobs: Dict[str, List[str]] = {}
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if state.get("fingerprint") == fingerprint:
+            self.last_commit = state.get("last_commit")
+            self.blobs = state.get("blobs", {})
+
+    def _save(self, last_commit: Optional[str]) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        state = {"fingerprint": self.fingerprint, "last_commit": last_commit, "blobs": self.blobs}
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+        self.last_commit = last_commit
+
+    def _objects(self, head: str, full: bool) -> Tuple[int, List[Tuple[str, str]]]:
+        """Return the number of new commits and the ``(blob, path)`` pairs they add."""
+        revs = [head]
+        if self.last_commit and not full:
+            is_ancestor = _git(self.toplevel, "merge-base", "--is-ancestor", self.last_commit, head)
+            # After a history rewrite start over; the blob cache still applies
+            if is_ancestor.returncode == 0:
+                revs.append(f"^{self.last_commit}")
+        count = _git(self.toplevel, "rev-list", "--count", *revs)
+        result = _git(self.toplevel, "rev-list", "--objects", "--filter=object:type=blob", *revs)
+        if count.returncode != 0 or result.returncode != 0:
+            raise RuntimeError((result.stderr or count.stderr).strip() or "git rev-list failed")
+        blobs: List[Tuple[str, str]] = []
+        for line in result.stdout.splitlines():
+            oid, _, path = line.partition(" ")
+            # Lines without a path are the commits given on the command line
+            if path:
+                blobs.append((oid, path))
+        return int(count.stdout.strip()), blobs
+
+    def run(self, rev: str = "HEAD", full: bool = False) -> Tuple[int, int, List[str]]:
+        """Scan commits reachable from ``rev`` that the checkpoint has not covered.
+
+        Returns ``(commits, blobs scanned, findings)``. Blobs already in the
+        cache are not read again; their cached findings are still reported.
+        With findings the checkpoint stays where it was, so the next run
+        covers (and reports) the same commits again.
+        """
+        result = _git(self.toplevel, "rev-parse", "--verify", f"{rev}^{{commit}}")
+        if result.returncode != 0:
+            raise RuntimeError(f"Unknown revision: {rev}")
+        head = result.stdout.strip()
+        commits, objects = self._objects(head, full)
+
+        findings: List[str] = []
+        paths: Dict[str, str] = {}
+        for oid, path in objects:
+            if oid in self.blobs:
+                findings.extend(self.blobs[oid])
+            else:
+                paths.setdefault(oid, path)
+        for oid, data in cat_file_batch(self.toplevel, list(paths)):
+            found: List[str] = []
+            if data is not None and not is_binary_data(Path(paths[oid]), data):
+                found = self.scan(data.decode("utf-8", errors="ignore"), f"{paths[oid]}@{oid[:12]}")
+            self.blobs[oid] = found
+            findings.extend(found)
+        # Blob findings are cached either way, so re-checking is cheap
+        self._save(self.last_commit if findings else head)
+        return commits, len(paths), findings
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,158 @@
+"""Write-ahead journal for crash-safe, undoable file writes.
+
+Every write goes to a temporary sibling that is renamed over the target, so
+a file is never left half-written. Before each write the journal durably
+records the target's prior state, which lets an interrupted run be undone in
+time proportional to the writes it had already made.
+"""
+
+from __future__ import annotations
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List
+
+
+class WriteJournal:
+    """Record and undo a sequence of file writes.
+
+    Records are appended to ``path`` (JSON lines); prior contents of
+    overwritten files are kept in the sibling ``<path>.d`` directory. Writes
+    below a directory created through :meth:`create_dir` need no per-file
+    record because undoing the directory removes them.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.backup_dir = self.path.with_name(self.path.name + ".d")
+        self._created: List[Path] = []
+        self._recorded: set = set()
+        self._count = 0
+
+    # ------------------------------------------------------------------
+    def _append(self, record: Dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(record) + "\n").encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _covered(self, path: Path) -> bool:
+        return any(root == path or root in path.parents for root in self._created)
+
+    def _record_prior_state(self, path: Path) -> None:
+        path = Path(os.path.abspath(path))
+        if path in self._recorded or self._covered(path):
+            return
+        self._recorded.add(path)
+        if path.is_symlink() or path.exists():
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            backup = self.backup_dir / str(self._count)
+            self._count += 1
+            if path.is_symlink():
+                backup.symlink_to(os.readlink(path))
+            else:
+                try:
+                    # A hard link preserves the old inode once the new file is renamed in
+                    os.link(path, backup)
+                except OSError:
+                    shutil.copy2(path, backup)
+            self._append({"path": str(path), "backup": str(backup)})
+        else:
+            self._append({"path": str(path), "backup": None})
+
+    def _replace(self, tmp: Path, path: Path) -> None:
+        self._record_prior_state(path)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _tmp_for(path: Path) -> Path:
+        return path.with_name(f".{path.name}.tmp-{os.getpid()}")
+
+    # ------------------------------------------------------------------
+    def create_dir(self, path: Path) -> None:
+        """Record that ``path`` is about to be created by this run."""
+        path = Path(os.path.abspath(path))
+        if path.exists():
+            raise FileExistsError(f"{path} already exists")
+        self._append({"path": str(path), "backup": None, "dir": True})
+        self._created.append(path)
+
+    def write_bytes(self, path: Path, data: bytes) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_for(path)
+        with tmp.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists() and not path.is_symlink():
+            shutil.copymode(path, tmp)
+        self._replace(tmp, path)
+
+    def write_text(self, path: Path, text: str, encoding: str = "utf-8") -> None:
+        self.write_bytes(path, text.encode(encoding))
+
+    def copy_file(self, src: Path, dst: Path) -> None:
+        """Copy ``src`` over ``dst`` atomically, like :func:`shutil.copy2`."""
+        dst = Path(dst)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_for(dst)
+        shutil.copy2(src, tmp)
+        self._replace(tmp, dst)
+
+    def symlink(self, target: str, dst: Path) -> None:
+        dst = Path(dst)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_for(dst)
+        tmp.symlink_to(target)
+        self._replace(tmp, dst)
+
+    # ------------------------------------------------------------------
+    def commit(self) -> None:
+        """Keep all writes and discard the journal."""
+        self.path.unlink(missing_ok=True)
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
+        self._created.clear()
+        self._recorded.clear()
+
+    def rollback(self) -> int:
+        """Undo every recorded write. Return the number of records undone."""
+        undone = self.recover(self.path)
+        self._created.clear()
+        self._recorded.clear()
+        return undone
+
+    @staticmethod
+    def recover(path: Path) -> int:
+        """Undo the writes recorded in the journal at ``path``, newest first.
+
+        Used both to roll back a failed run and to clean up after a run that
+        was killed. Returns the number of records undone.
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        records = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn trailing record: its write never happened
+                continue
+        for record in reversed(records):
+            target = Path(record["path"])
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            elif target.exists() or target.is_symlink():
+                target.unlink()
+            backup = record.get("backup")
+            if backup:
+                os.replace(backup, target)
+        path.unlink()
+        shutil.rmtree(path.with_name(path.name + ".d"), ignore_errors=True)
+        return len(records)
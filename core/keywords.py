@@ -0,0 +1,93 @@
+"""Shared case-insensitive matcher for private keywords.
+
+:class:`KeywordMatcher` compiles its keywords into one regex, so testing a
+line or a whole buffer for any keyword is a single pass without lowercasing
+copies. :func:`keyword_matcher` returns the (cached) matcher for
+:data:`~core.constants.KEYWORDS` plus the ``keywords`` list of a workflow
+config; callers pass the matcher on to whatever checks lines.
+"""
+
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .constants import KEYWORDS
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """Return a regex matching any of ``words``, longest alternative first.
+
+    Words sharing a prefix share a branch, so the regex engine tests each
+    prefix once however many words start with it.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        # Single-child chains become plain literals without recursing
+        prefix = []
+        while len(node) == 1 and "" not in node:
+            (ch, node), = node.items()
+            prefix.append(re.escape(ch))
+        children = sorted(k for k in node if k)
+        if not children:
+            return "".join(prefix)
+        alternatives = [re.escape(ch) + build(node[ch]) for ch in children]
+        group = "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            group += "?"
+        return "".join(prefix) + group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Find any of ``keywords`` in text, ignoring case."""
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: List[str] = list(dict.fromkeys(kw for kw in keywords if kw))
+        self._pattern = (
+            re.compile(trie_regex(kw.lower() for kw in self.keywords), re.IGNORECASE)
+            if self.keywords
+            else None
+        )
+        self._each = [(kw, re.compile(re.escape(kw), re.IGNORECASE)) for kw in self.keywords]
+
+    def search(self, text: str) -> bool:
+        """Return True if ``text`` contains any keyword."""
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+    def find(self, text: str) -> List[str]:
+        """Return the keywords contained in ``text``, in keyword order."""
+        if not self.search(text):
+            return []
+        # Only reached for matching text: keywords may overlap, so settle
+        # which ones occur individually
+        return [kw for kw, regex in self._each if regex.search(text)]
+
+    def first(self, text: str) -> Optional[str]:
+        """Return the first keyword (in keyword order) contained in ``text``."""
+        if not self.search(text):
+            return None
+        for kw, regex in self._each:
+            if regex.search(text):
+                return kw
+        return None
+
+
+@lru_cache(maxsize=None)
+def _matcher(extra: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher([*KEYWORDS, *extra])
+
+
+def keyword_matcher(cfg: Optional[Mapping] = None) -> KeywordMatcher:
+    """Return the matcher for ``KEYWORDS`` plus ``cfg['keywords']``."""
+    extra = (cfg or {}).get("keywords") or []
+    if isinstance(extra, str):
+        extra = [extra]
+    return _matcher(tuple(str(kw) for kw in extra))
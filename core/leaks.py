@@ -0,0 +1,117 @@
+"""Search text for private profile values.
+
+:class:`ProfileLeakScanner` compiles every profile value, its slug form and
+its identifier forms (:func:`~core.utils.sanitize_identifier` and the value
+with separators removed) into a single case-insensitive regex shaped like a
+trie, so shared prefixes are matched once. Scanning a file is then one pass
+of the regex engine over its text no matter how many values the profile has.
+
+Values are not matched inside longer words, but ``_`` counts as a separator
+so ``ACME_CORP_URL`` still matches, and a value may run into a following
+capitalised word, as in ``AcmeCorpClient``. Values that are not filled in
+yet are ignored.
+"""
+
+from __future__ import annotations
+import re
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Pattern, Tuple
+
+from .keywords import trie_regex
+from .utils import is_binary_file, newest_first, sanitize_identifier
+
+# Shorter values match too much ordinary text to be worth reporting
+MIN_VALUE_LENGTH = 4
+# Values validate_profile_values treats as not filled in
+UNSET_VALUES = {"", "TODO", "FIXME"}
+
+
+def _is_unset(value: str) -> bool:
+    return value.upper() in UNSET_VALUES or re.fullmatch(r"\{\{.*\}\}", value) is not None
+
+
+# No letter or digit may touch a match on the left, but ``_`` may. On the
+# right a match also ends where a capital starts a new word, as when a value
+# is rendered into ``{{ ORG }}Client``
+_LEFT = r"(?<![^\W_])"
+_RIGHT = r"(?:(?![^\W_])|(?-i:(?<=[a-z0-9])(?=[A-Z])|(?=[A-Z][a-z])))"
+
+
+def _variants(value: str) -> List[str]:
+    slug = re.sub(r"[^\w]+", "-", value).strip("-")
+    compact = re.sub(r"[\W_]+", "", value)
+    return [value, sanitize_identifier(value), slug, compact]
+
+
+class ProfileLeakScanner:
+    """Find occurrences of profile values in text or files."""
+
+    def __init__(self, profile: Mapping[str, object], min_length: int = MIN_VALUE_LENGTH) -> None:
+        self.keys: Dict[str, str] = {}
+        for key, value in profile.items():
+            if not isinstance(value, str) or _is_unset(value.strip()):
+                continue
+            for variant in _variants(value.strip()):
+                if len(variant) >= min_length:
+                    self.keys.setdefault(variant.lower(), key)
+        self.pattern: Optional[Pattern] = None
+        if self.keys:
+            # Not part of a longer word, e.g. "acme" in "acmeville"
+            self.pattern = re.compile(
+                rf"{_LEFT}(?:{trie_regex(self.keys)}){_RIGHT}", re.IGNORECASE
+            )
+
+    def scan_text(self, text: str) -> List[Tuple[int, str, str]]:
+        """Return ``(lineno, key, line)`` for every line containing a value."""
+        if self.pattern is None:
+            return []
+        found: List[Tuple[int, str, str]] = []
+        lineno = 1
+        pos = 0
+        last_line = 0
+        for m in self.pattern.finditer(text):
+            lineno += text.count("\n", pos, m.start())
+            pos = m.start()
+            key = self.keys.get(m.group(0).lower(), m.group(0))
+            if lineno == last_line and found and found[-1][1] == key:
+                continue
+            start = text.rfind("\n", 0, m.start()) + 1
+            end = text.find("\n", m.end())
+            line = text[start:] if end == -1 else text[start:end]
+            found.append((lineno, key, line))
+            last_line = lineno
+        return found
+
+    def report(self, text: str, label: str) -> List[str]:
+        """Return report lines for the values found in ``text``."""
+        return [
+            f"{label}:{lineno}: Profile value {key} -> {line.strip()}"
+            for lineno, key, line in self.scan_text(text)
+        ]
+
+    def scan_file(self, path: Path, label: Optional[str] = None) -> List[str]:
+        """Return report lines for the values found in ``path``, named ``label``."""
+        if self.pattern is None or is_binary_file(path):
+            return []
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        return self.report(text, str(path) if label is None else label)
+
+    def scan_directory(
+        self, base_dir: Path, fail_fast: bool = False, label: Optional[Path] = None
+    ) -> bool:
+        """Print every value found under ``base_dir``; return True if none.
+
+        ``fail_fast`` scans the most recently modified files first and stops
+        after the first file containing a value. Reports name files as if
+        ``base_dir`` were ``label``.
+        """
+        files = [p for p in base_dir.rglob("*") if p.is_file()]
+        ok = True
+        for path in newest_first(files) if fail_fast else sorted(files):
+            name = None if label is None else str(Path(label) / path.relative_to(base_dir))
+            for line in self.scan_file(path, name):
+                print(line)
+                ok = False
+            if fail_fast and not ok:
+                break
+        return ok
@@ -1,26 +1,197 @@
 from __future__ import annotations
+import copy
+import gzip
 import json
+import lzma
+import os
+import re
 import shutil
 import subprocess
+import tarfile
+import tempfile
+import threading
 # Use timezone-aware timestamps to avoid ambiguity in comparisons and logging
 # Rollbacks use UTC so snapshots are consistent across environments
-from datetime import datetime, timezone
-from hashlib import sha256
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1, sha256
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from .git_state import GitState, collect_git_state
+from .history import cat_file_batch
+from .utils import CHUNK_SIZE, sha256_file
+
+
+# Bytes of a file buffered in memory before archiving spills to disk
+SPOOL_SIZE = 16 * 1024 * 1024
+
+# ``blobs`` copies file contents into the shared blob store, ``git`` records a
+# tree object built from the repository's own blob hashes and ``archive``
+# streams each snapshot into a single compressed tar file.
+BACKENDS = ("blobs", "git", "archive")
+COMPRESSIONS = ("xz", "gz")
+
+# Snapshot directories are named by their UTC creation time
+SNAPSHOT_ID = re.compile(r"\d{8}T\d{12}Z")
+
+
+def _git_blob_hash(path: Path) -> str:
+    """Return the object ID git would assign to ``path`` as a blob."""
+    if path.is_symlink():
+        data = os.readlink(path).encode()
+        return sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    hasher = sha1(b"blob %d\0" % path.stat().st_size)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class _HashingReader:
+    """File wrapper that hashes everything read through it."""
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self.fileobj = fileobj
+        self.hasher = sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+
+def _open_archive(path: Path, mode: str, level: Optional[int] = None) -> BinaryIO:
+    """Open a snapshot archive for streaming, choosing the codec by suffix."""
+    if path.name.endswith(".xz"):
+        return lzma.open(path, mode, preset=level if "w" in mode else None)
+    return gzip.open(path, mode, compresslevel=9 if level is None else level)
+
+
+# Exclusive OS-level locks for _StorageLock, released when the file closes
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f: BinaryIO) -> None:
+        f.seek(0)
+        while True:
+            try:
+                # LK_LOCK retries for about ten seconds before giving up
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(f: BinaryIO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock_file(f: BinaryIO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f: BinaryIO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class _StorageLock:
+    """Reentrant lock on the snapshot storage, shared with other processes.
+
+    A thread lock orders threads of this process; the outermost acquisition
+    also takes an exclusive OS lock on ``path`` so that, for example,
+    ``workflow.py rollback gc`` in another process waits for a snapshot that
+    is still being written.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(os.path.abspath(path))
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file: Optional[BinaryIO] = None
+
+    def __enter__(self) -> "_StorageLock":
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a+b")
+                try:
+                    _lock_file(self._file)
+                except BaseException:
+                    self._file.close()
+                    raise
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
 
 
 class RollbackManager:
-    """Manage workflow rollback snapshots."""
+    """Manage workflow rollback snapshots.
+
+    File contents are kept in a content-addressed blob store under
+    ``.workflow-rollbacks/objects`` and shared between snapshots. Each
+    snapshot directory only holds its metadata and a manifest mapping tracked
+    paths to blob hashes. An append-only ``index.jsonl`` records snapshot
+    creation and deletion so listings never open the snapshot directories.
+
+    With the ``git`` backend the blobs live in the repository's object
+    database instead and the snapshot records a tree ID. The ``archive``
+    backend writes one compressed tar per snapshot (``compression`` is ``xz``
+    or ``gz``, ``compression_level`` the codec's preset).
 
-    def __init__(self, root_dir: Path, max_history: int = 5) -> None:
+    Retention keeps at most ``max_history`` snapshots, optionally bounded by
+    ``max_bytes`` and ``max_age_days`` as well.
+    """
+
+    def __init__(
+        self,
+        root_dir: Path,
+        max_history: int = 5,
+        backend: str = "blobs",
+        compression: str = "xz",
+        compression_level: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        background_gc: bool = False,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown rollback backend: {backend}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown snapshot compression: {compression}")
         self.root_dir = root_dir
         self.max_history = max_history
+        self.backend = backend
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.background_gc = background_gc
+        self._gc_thread: Optional[threading.Thread] = None
         self.storage = self.root_dir / ".workflow-rollbacks"
+        self._lock = _StorageLock(self.storage / "lock")
+        self.objects = self.storage / "objects"
+        self.index_file = self.storage / "index.jsonl"
         self.storage.mkdir(exist_ok=True)
 
     # ------------------------------------------------------------------
-    def _run_git(self, *args: str) -> Optional[str]:
+    def _run_git(
+        self, *args: str, index_file: Optional[Path] = None, input: Optional[str] = None
+    ) -> Optional[str]:
+        env = None
+        if index_file is not None:
+            env = {**os.environ, "GIT_INDEX_FILE": str(index_file.resolve())}
         try:
             result = subprocess.run(
                 ["git", *args],
@@ -29,37 +200,143 @@ class RollbackManager:
                 stderr=subprocess.PIPE,
                 check=True,
                 text=True,
+                env=env,
+                input=input,
             )
             return result.stdout.strip()
         except Exception:
             return None
 
-    def _hash_tracked_files(self) -> str:
-        files_list = self._run_git("ls-files")
-        if not files_list:
-            return ""
+    # ------------------------------------------------------------------
+    def _append_index(self, record: Dict) -> None:
+        """Append one record to the index with a single ``O_APPEND`` write."""
+        if not self.index_file.exists():
+            self._load_index()  # migrate storage created before the index existed
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        fd = os.open(self.index_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_index(self, snaps: List[Dict]) -> None:
+        """Atomically replace the index with ``create`` records for ``snaps``."""
+        self.storage.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for meta in snaps:
+                f.write(json.dumps({"event": "create", "snapshot": meta}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_file)
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Return live snapshots keyed by timestamp, oldest first.
+
+        Storage written before the index existed is indexed once from the
+        per-snapshot ``metadata.json`` files.
+        """
+        if not self.index_file.exists():
+            snaps = []
+            for path in sorted(self.storage.glob("*/metadata.json")):
+                try:
+                    snaps.append(json.loads(path.read_text()))
+                except Exception:
+                    continue
+            if snaps:
+                self._write_index(snaps)
+            return {meta["timestamp"]: meta for meta in snaps if "timestamp" in meta}
+
+        live: Dict[str, Dict] = {}
+        with self.index_file.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn trailing write from an interrupted run
+                    continue
+                if record.get("event") == "create":
+                    meta = record["snapshot"]
+                    live[meta["timestamp"]] = meta
+                elif record.get("event") == "delete":
+                    live.pop(record.get("timestamp"), None)
+        return dict(sorted(live.items()))
+
+    # ------------------------------------------------------------------
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def _store_blob(self, src: Path) -> str:
+        """Stream ``src`` into the blob store and return its SHA-256."""
+        self.objects.mkdir(parents=True, exist_ok=True)
+        hasher = sha256()
+        tmp = self.objects / f"tmp-{os.getpid()}-{id(src)}"
+        with src.open("rb") as f_src, tmp.open("wb") as f_dst:
+            for chunk in iter(lambda: f_src.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+                f_dst.write(chunk)
+        digest = hasher.hexdigest()
+        blob = self._blob_path(digest)
+        if blob.exists():
+            tmp.unlink()
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            os.replace(tmp, blob)
+        return digest
+
+    def _load_manifest(self, snapshot_id: str) -> Optional[Dict[str, Dict]]:
+        manifest = self.storage / snapshot_id / "manifest.json"
+        try:
+            return json.loads(manifest.read_text())
+        except Exception:
+            return None
+
+    def _latest_manifest(self) -> Dict[str, Dict]:
+        """Return the manifest of the newest snapshot, used as a stat cache."""
+        for ts in reversed(list(self._load_index())):
+            manifest = self._load_manifest(ts)
+            if manifest is not None:
+                return manifest
+        return {}
+
+    @staticmethod
+    def _manifest_hash(manifest: Dict[str, Dict]) -> str:
         hasher = sha256()
-        for rel in files_list.splitlines():
-            path = self.root_dir / rel
-            if path.is_file():
-                hasher.update(rel.encode())
-                hasher.update(path.read_bytes())
+        for rel in sorted(manifest):
+            entry = manifest[rel]
+            hasher.update(rel.encode())
+            hasher.update(entry.get("hash", "link:" + entry.get("link", "")).encode())
         return hasher.hexdigest()
 
-    def _copy_tracked_files(self, dst: Path) -> None:
-        """Copy tracked files with robust error handling."""
-        files_list = self._run_git("ls-files")
-        if not files_list:
-            return
+    def _key(self, path: Path) -> str:
+        """Return the manifest key for ``path``: root-relative when possible."""
+        path = Path(os.path.abspath(path))
+        try:
+            return path.relative_to(os.path.abspath(self.root_dir)).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _store_files(self, rels: Iterable[str]) -> Dict[str, Dict]:
+        """Store files as blobs and return the snapshot manifest.
 
-        dst = Path(dst)
-        successful_copies = 0
-        failed_copies = 0
+        Files whose size and mtime match the previous snapshot reuse its blob
+        without being read again. Symlinks are recorded by target.
+        """
+        previous = self._latest_manifest()
+        manifest: Dict[str, Dict] = {}
+        reused = 0
+        stored = 0
+        failed = 0
 
-        for rel in files_list.splitlines():
+        for rel in rels:
             try:
                 src = self.root_dir / rel
 
+                if src.is_symlink():
+                    manifest[rel] = {"link": os.readlink(src)}
+                    continue
+
                 # Skip if source doesn't exist
                 if not src.exists():
                     print(f"Info: Tracked file not in working tree: {rel}")
@@ -71,78 +348,402 @@ class RollbackManager:
                     continue
 
                 if src.is_file():
-                    target = dst / rel
-
-                    # Create parent directories
-                    target.parent.mkdir(parents=True, exist_ok=True)
-
-                    # Copy file
-                    shutil.copy2(src, target)
-                    successful_copies += 1
+                    st = src.stat()
+                    entry = {
+                        "size": st.st_size,
+                        "mtime": st.st_mtime_ns,
+                        "mode": st.st_mode & 0o777,
+                    }
+                    prev = previous.get(rel)
+                    if (
+                        prev
+                        and "hash" in prev
+                        and prev.get("size") == entry["size"]
+                        and prev.get("mtime") == entry["mtime"]
+                        and self._blob_path(prev["hash"]).exists()
+                    ):
+                        entry["hash"] = prev["hash"]
+                        reused += 1
+                    else:
+                        entry["hash"] = self._store_blob(src)
+                        stored += 1
+                    manifest[rel] = entry
 
             except Exception as e:
-                failed_copies += 1
+                failed += 1
                 print(f"Warning: Could not copy {rel}: {e}")
                 continue
 
-        print(f"Rollback snapshot: {successful_copies} files copied, {failed_copies} failed")
-            
-            
-# ------------------------------------------------------------------
-    def create_snapshot(self, operation: str, config_snapshot: Optional[Dict] = None) -> str:
-        # Use UTC so snapshot timestamps sort consistently regardless of local timezone
-        ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
-        snap_dir = self.storage / ts
-        snap_dir.mkdir(parents=True, exist_ok=True)
-        files_dir = snap_dir / "files"
-        files_dir.mkdir()
-
-        branch = self._run_git("rev-parse", "--abbrev-ref", "HEAD") or ""
-        commit = self._run_git("rev-parse", "HEAD") or ""
-        status = self._run_git("status", "--porcelain") or ""
-        dirty = [line[3:] for line in status.splitlines() if line and line[0] != " "]
-
-        self._copy_tracked_files(files_dir)
-
-        meta = {
-            "timestamp": ts,
-            "operation": operation,
-            "branch": branch,
-            "commit": commit,
-            "files_hash": self._hash_tracked_files(),
-            "config_snapshot": config_snapshot or {},
-            "dirty_files": dirty,
-        }
-        (snap_dir / "metadata.json").write_text(json.dumps(meta, indent=2))
-        (snap_dir / "git-state.json").write_text(
-            json.dumps({"branch": branch, "commit": commit, "status": status}, indent=2)
+        print(
+            f"Rollback snapshot: {stored} files stored, {reused} unchanged, {failed} failed"
         )
+        return manifest
+
+    def _archive_files(self, rels: Iterable[str], archive: Path) -> Dict[str, Dict]:
+        """Stream files into a compressed tar and return the snapshot manifest.
+
+        Each file is read once, into a spool (memory up to ``SPOOL_SIZE``,
+        then disk) while it is hashed, and only then added to the tar. A
+        tar header must state the size up front, so a file that changes size
+        mid-read cannot corrupt the stream, and a file that cannot be read is
+        skipped before anything of it is written. Errors writing the archive
+        itself propagate.
+        """
+        manifest: Dict[str, Dict] = {}
+        failed = 0
+        with _open_archive(archive, "wb", self.compression_level) as raw, tarfile.open(
+            fileobj=raw, mode="w|"
+        ) as tar:
+            for rel in rels:
+                src = self.root_dir / rel
+                try:
+                    info = tarfile.TarInfo(rel)
+                    if src.is_symlink():
+                        info.type = tarfile.SYMTYPE
+                        info.linkname = os.readlink(src)
+                        tar.addfile(info)
+                        manifest[rel] = {"link": info.linkname}
+                        continue
+                    if not src.is_file():
+                        continue
+                    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+                    hasher = sha256()
+                    with src.open("rb") as f:
+                        st = os.fstat(f.fileno())
+                        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                            hasher.update(chunk)
+                            spool.write(chunk)
+                except OSError as e:
+                    failed += 1
+                    print(f"Warning: Could not archive {rel}: {e}")
+                    continue
+                with spool:
+                    info.size = spool.tell()
+                    info.mtime = int(st.st_mtime)
+                    info.mode = st.st_mode & 0o777
+                    spool.seek(0)
+                    tar.addfile(info, spool)
+                manifest[rel] = {
+                    "hash": hasher.hexdigest(),
+                    "size": info.size,
+                    "mtime": st.st_mtime_ns,
+                    "mode": info.mode,
+                }
+        print(f"Rollback snapshot: {len(manifest)} files archived, {failed} failed")
+        return manifest
+
+    def _scope_files(self, paths: Iterable[Path]) -> Tuple[Dict[str, bool], List[str]]:
+        """Expand a write set into manifest keys.
+
+        Returns a mapping of each scope root to whether it existed, plus the
+        keys of every file and symlink below the roots. Untracked files are
+        included since the write set usually lives outside version control.
+        """
+        scope: Dict[str, bool] = {}
+        rels: List[str] = []
+        for path in paths:
+            path = self.root_dir / path
+            key = self._key(path)
+            scope[key] = path.exists() or path.is_symlink()
+            if path.is_dir() and not path.is_symlink():
+                for root, dirs, files in os.walk(path):
+                    if Path(root).resolve() == self.storage.resolve():
+                        dirs[:] = []
+                        continue
+                    for name in files + [d for d in dirs if (Path(root) / d).is_symlink()]:
+                        rels.append(self._key(Path(root) / name))
+            elif scope[key]:
+                rels.append(key)
+        return scope, rels
+
+    def _snapshot_git_tree(self, snap_dir: Path) -> Optional[Tuple[str, Dict[str, Dict]]]:
+        """Record tracked files as a git tree, like ``git stash create``.
+
+        A private copy of the index is refreshed with ``git add -u`` so only
+        files that differ from the index are hashed and written as objects.
+        Returns ``(tree_id, manifest)`` or ``None`` when git is unavailable.
+        """
+        index = self._run_git("rev-parse", "--git-path", "index")
+        if index is None:
+            return None
+        tmp_index = snap_dir / "index"
+        src_index = self.root_dir / index
+        if src_index.exists():
+            shutil.copyfile(src_index, tmp_index)
+        try:
+            if self._run_git("add", "-u", index_file=tmp_index) is None:
+                return None
+            tree = self._run_git("write-tree", index_file=tmp_index)
+            staged = self._run_git("ls-files", "-s", "-z", index_file=tmp_index)
+        finally:
+            tmp_index.unlink(missing_ok=True)
+        if not tree or staged is None:
+            return None
+        # Keep the tree reachable so ``git gc`` does not prune it
+        self._run_git("update-ref", f"refs/workflow-rollbacks/{snap_dir.name}", tree)
+
+        manifest: Dict[str, Dict] = {}
+        for record in staged.split("\0"):
+            if not record:
+                continue
+            info, rel = record.split("\t", 1)
+            mode, blob, _stage = info.split()
+            entry: Dict = {"hash": blob, "mode": int(mode, 8) & 0o777}
+            try:
+                st = (self.root_dir / rel).stat()
+                entry.update(size=st.st_size, mtime=st.st_mtime_ns)
+            except OSError:
+                pass
+            manifest[rel] = entry
+        print(f"Rollback snapshot: tree {tree[:12]} with {len(manifest)} files")
+        return tree, manifest
+
+    # ------------------------------------------------------------------
+    def create_snapshot(
+        self,
+        operation: str,
+        config_snapshot: Optional[Dict] = None,
+        paths: Optional[Iterable[Path]] = None,
+        git_state: Optional[GitState] = None,
+    ) -> str:
+        """Snapshot the repository and return the snapshot ID.
+
+        ``paths`` limits the snapshot to the write set of the pending
+        operation. Scoped snapshots skip git state collection, never use the
+        ``git`` backend (the write set is usually untracked) and are restored
+        without resetting the repository. ``git_state`` reuses state already
+        collected by the caller instead of querying git again.
+        """
+        # Hold the lock so a collection, in this process or another, never
+        # sees a snapshot directory or blobs that the index does not list yet
+        with self._lock:
+            # Use UTC so snapshot timestamps sort consistently regardless of local timezone
+            ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            snap_dir = self.storage / ts
+            snap_dir.mkdir(parents=True, exist_ok=True)
+
+            scope = None
+            branch = commit = status = ""
+            dirty: List[str] = []
+            rels: List[str] = []
+            if paths is not None:
+                scope, rels = self._scope_files(paths)
+            else:
+                state = git_state or collect_git_state(self.root_dir)
+                if state is not None:
+                    branch, commit, status = state.branch, state.commit, state.status
+                    dirty = state.dirty_files
+                    rels = state.tracked_files(self.root_dir)
+
+            backend = self.backend
+            if scope is not None and backend == "git":
+                backend = "blobs"
+            tree = None
+            archive = None
+            if backend == "git":
+                result = self._snapshot_git_tree(snap_dir)
+                if result is None:
+                    print("Warning: git snapshot failed, falling back to blob store")
+                    backend = "blobs"
+                else:
+                    tree, manifest = result
+            if backend != "git":
+                if backend == "archive":
+                    archive = f"files.tar.{self.compression}"
+                    try:
+                        manifest = self._archive_files(rels, snap_dir / archive)
+                    except BaseException:
+                        # Never leave a half-written archive behind as a snapshot
+                        shutil.rmtree(snap_dir, ignore_errors=True)
+                        raise
+                else:
+                    manifest = self._store_files(rels)
+
+            meta = {
+                "timestamp": ts,
+                "operation": operation,
+                "backend": backend,
+                "branch": branch,
+                "commit": commit,
+                "files_hash": self._manifest_hash(manifest) if manifest else "",
+                "config_snapshot": config_snapshot or {},
+                "dirty_files": dirty,
+            }
+            if tree:
+                meta["tree"] = tree
+            if archive:
+                meta["archive"] = archive
+            if scope is not None:
+                meta["scope"] = scope
+            if archive:
+                meta["size_bytes"] = (snap_dir / archive).stat().st_size
+            else:
+                meta["size_bytes"] = sum(e.get("size", 0) for e in manifest.values())
+            (snap_dir / "manifest.json").write_text(json.dumps(manifest))
+            (snap_dir / "metadata.json").write_text(json.dumps(meta, indent=2))
+            (snap_dir / "git-state.json").write_text(
+                json.dumps({"branch": branch, "commit": commit, "status": status}, indent=2)
+            )
+            self._append_index({"event": "create", "snapshot": meta})
 
         self.cleanup_old_snapshots()
         return ts
 
     def list_snapshots(self) -> List[Dict]:
-        snaps: List[Dict] = []
-        for path in sorted(self.storage.glob("*/metadata.json")):
-            try:
-                data = json.loads(path.read_text())
-                snaps.append(data)
-            except Exception:
-                continue
-        snaps.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        return snaps
+        """Return snapshot metadata from the index, newest first."""
+        return list(reversed(self._load_index().values()))
+
+    def get_snapshot(self, steps: int = 0) -> Optional[Dict]:
+        """Return the snapshot ``steps`` back from the newest one, if any."""
+        snaps = self.list_snapshots()
+        if 0 <= steps < len(snaps):
+            return snaps[steps]
+        return None
 
     def verify_snapshot(self, snapshot_id: str) -> bool:
         snap = self.storage / snapshot_id
         meta_file = snap / "metadata.json"
-        files_dir = snap / "files"
-        if not meta_file.exists() or not files_dir.is_dir():
+        if not meta_file.exists():
             return False
         try:
-            json.loads(meta_file.read_text())
+            meta = json.loads(meta_file.read_text())
         except Exception:
             return False
-        return True
+        if (snap / "files").is_dir():
+            # Snapshot written before the blob store existed
+            return True
+        manifest = self._load_manifest(snapshot_id)
+        if manifest is None:
+            return False
+        if meta.get("backend") == "git":
+            tree = meta.get("tree")
+            return bool(tree) and self._run_git("cat-file", "-e", f"{tree}^{{tree}}") is not None
+        if meta.get("backend") == "archive":
+            archive = snap / meta.get("archive", "")
+            if not archive.is_file():
+                return False
+            try:
+                with _open_archive(archive, "rb") as raw, tarfile.open(fileobj=raw, mode="r|") as tar:
+                    tar.next()
+            except (OSError, EOFError, lzma.LZMAError, tarfile.TarError):
+                return False
+            return True
+        return all(self._blob_path(e["hash"]).exists() for e in manifest.values() if "hash" in e)
+
+    def verify_contents(self, snapshot_id: str, workers: Optional[int] = None) -> List[str]:
+        """Re-hash snapshot contents and return the entries that are corrupted.
+
+        Blob-store snapshots are checked on a thread pool of ``workers``
+        threads (``hashlib`` releases the GIL while hashing). Archives are
+        streamed once and git snapshots are read back with
+        ``git cat-file --batch`` and re-hashed as blobs.
+        """
+        if not self.verify_snapshot(snapshot_id):
+            return ["metadata"]
+        snap = self.storage / snapshot_id
+        meta = json.loads((snap / "metadata.json").read_text())
+        manifest = self._load_manifest(snapshot_id)
+        if manifest is None:
+            # Snapshot written before per-file hashes were recorded
+            return []
+        if meta.get("backend") == "git":
+            return self._verify_git_objects(manifest)
+        if meta.get("backend") == "archive":
+            return self._verify_archive(snap / meta["archive"], manifest)
+
+        by_hash: Dict[str, List[str]] = {}
+        for rel, entry in manifest.items():
+            if "hash" in entry:
+                by_hash.setdefault(entry["hash"], []).append(rel)
+
+        def check(digest: str) -> bool:
+            try:
+                return sha256_file(self._blob_path(digest)) == digest
+            except OSError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = pool.map(check, list(by_hash))
+            corrupted = [
+                rel for digest, ok in zip(by_hash, results) if not ok for rel in by_hash[digest]
+            ]
+        return sorted(corrupted)
+
+    def _verify_archive(self, archive: Path, manifest: Dict[str, Dict]) -> List[str]:
+        expected = {rel: e["hash"] for rel, e in manifest.items() if "hash" in e}
+        corrupted: List[str] = []
+        try:
+            with _open_archive(archive, "rb") as raw, tarfile.open(fileobj=raw, mode="r|") as tar:
+                for member in tar:
+                    if member.name not in expected or not member.isfile():
+                        continue
+                    reader = _HashingReader(tar.extractfile(member))
+                    while reader.read(CHUNK_SIZE):
+                        pass
+                    if reader.hasher.hexdigest() != expected.pop(member.name):
+                        corrupted.append(member.name)
+        except (OSError, EOFError, lzma.LZMAError, tarfile.TarError):
+            pass
+        # Anything not reached is missing or lies beyond the point of damage
+        return sorted(corrupted + list(expected))
+
+    def _verify_git_objects(self, manifest: Dict[str, Dict]) -> List[str]:
+        """Read each blob back from git and check it still hashes to its ID."""
+        rels = [rel for rel, e in manifest.items() if "hash" in e]
+        corrupted = set(rels)
+        try:
+            objects = cat_file_batch(self.root_dir, [manifest[r]["hash"] for r in rels])
+            for rel, (oid, data) in zip(rels, objects):
+                if data is not None and sha1(b"blob %d\0" % len(data) + data).hexdigest() == oid:
+                    corrupted.discard(rel)
+        except OSError:
+            pass
+        # Entries git never answered for (it stops at unreadable objects) count as corrupted
+        return sorted(corrupted)
+
+    def _restore_entry(self, entry: Dict, dst: Path, src: Optional[BinaryIO]) -> None:
+        """Write one manifest entry to ``dst``, streaming content from ``src``."""
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if dst.is_symlink():
+            dst.unlink()
+        elif dst.is_dir():
+            shutil.rmtree(dst)
+        if "link" in entry:
+            dst.unlink(missing_ok=True)
+            dst.symlink_to(entry["link"])
+            return
+        with dst.open("wb") as out:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+        os.chmod(dst, entry.get("mode", 0o644))
+        mtime = entry.get("mtime")
+        if mtime is not None:
+            os.utime(dst, ns=(mtime, mtime))
+
+    def _restore_blob(self, entry: Dict, dst: Path) -> None:
+        if "link" in entry:
+            self._restore_entry(entry, dst, None)
+            return
+        with self._blob_path(entry["hash"]).open("rb") as src:
+            self._restore_entry(entry, dst, src)
+
+    def _restore_archive(self, archive: Path, manifest: Dict[str, Dict], paths: List[str]) -> bool:
+        """Stream ``archive`` once, extracting only ``paths``."""
+        wanted = set(paths)
+        if not wanted:
+            return True
+        with _open_archive(archive, "rb") as raw, tarfile.open(fileobj=raw, mode="r|") as tar:
+            for member in tar:
+                if member.name not in wanted:
+                    continue
+                self._restore_entry(
+                    manifest[member.name],
+                    self.root_dir / member.name,
+                    tar.extractfile(member) if member.isfile() else None,
+                )
+                wanted.discard(member.name)
+                if not wanted:
+                    break
+        return not wanted
 
     def rollback_to(self, snapshot_id: str, dry_run: bool = False) -> bool:
         if not self.verify_snapshot(snapshot_id):
@@ -154,25 +755,237 @@ class RollbackManager:
 
         branch = meta.get("branch")
         commit = meta.get("commit")
-        if branch and commit:
+        if branch and commit and "scope" not in meta:
             self._run_git("checkout", branch)
             self._run_git("reset", "--hard", commit)
-            self._run_git("clean", "-fd")
+            # Keep the snapshot store itself out of the clean
+            self._run_git("clean", "-fd", "-e", self.storage.name)
 
         files_dir = snap / "files"
-        for src in files_dir.rglob("*"):
-            if src.is_file():
-                rel = src.relative_to(files_dir)
-                dst = self.root_dir / rel
-                dst.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(src, dst)
+        if files_dir.is_dir():
+            for src in files_dir.rglob("*"):
+                if src.is_file():
+                    rel = src.relative_to(files_dir)
+                    dst = self.root_dir / rel
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, dst)
+            return True
+
+        manifest = self._load_manifest(snapshot_id) or {}
+        git_backend = meta.get("backend") == "git"
+        changed = self._changed_paths(manifest, git_backend)
+        print(f"Rollback: restoring {len(changed)} files, {len(manifest) - len(changed)} unchanged")
+        if git_backend:
+            return self._restore_git_tree(meta["tree"], snap, changed)
+        if meta.get("backend") == "archive":
+            if not self._restore_archive(snap / meta["archive"], manifest, changed):
+                return False
+        else:
+            with ThreadPoolExecutor() as pool:
+                futures = [
+                    pool.submit(self._restore_blob, manifest[rel], self.root_dir / rel)
+                    for rel in changed
+                ]
+                for future in futures:
+                    future.result()
+        if "scope" in meta:
+            self._prune_scope(meta["scope"], manifest)
         return True
 
+    def _prune_scope(self, scope: Dict[str, bool], manifest: Dict[str, Dict]) -> None:
+        """Remove files the interrupted operation added inside its write set."""
+        for key, existed in scope.items():
+            root = self.root_dir / key
+            if not existed:
+                if root.is_dir() and not root.is_symlink():
+                    shutil.rmtree(root)
+                elif root.exists() or root.is_symlink():
+                    root.unlink()
+                continue
+            if not root.is_dir() or root.is_symlink():
+                continue
+            for current, dirs, files in os.walk(root, topdown=False):
+                for name in files + [d for d in dirs if (Path(current) / d).is_symlink()]:
+                    path = Path(current) / name
+                    if self._key(path) not in manifest:
+                        path.unlink()
+                if Path(current) != root and not any(Path(current).iterdir()):
+                    Path(current).rmdir()
+
+    def _changed_paths(self, manifest: Dict[str, Dict], git_backend: bool) -> List[str]:
+        """Return manifest paths whose working tree copy differs from the snapshot.
+
+        Size and mtime are compared first; content is only hashed when they
+        do not settle the question.
+        """
+        changed: List[str] = []
+        for rel, entry in manifest.items():
+            path = self.root_dir / rel
+            if "link" in entry:
+                if not path.is_symlink() or os.readlink(path) != entry["link"]:
+                    changed.append(rel)
+                continue
+            if path.is_symlink():
+                changed.append(rel)
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                changed.append(rel)
+                continue
+            if st.st_size != entry.get("size", st.st_size):
+                changed.append(rel)
+                continue
+            if st.st_mtime_ns == entry.get("mtime"):
+                continue
+            try:
+                digest = _git_blob_hash(path) if git_backend else sha256_file(path)
+            except OSError:
+                digest = None
+            if digest != entry["hash"]:
+                changed.append(rel)
+        return changed
+
+    def _restore_git_tree(self, tree: str, snap: Path, paths: List[str]) -> bool:
+        """Check ``paths`` out of ``tree`` without touching the real index."""
+        if not paths:
+            return True
+        tmp_index = snap / "index"
+        try:
+            if self._run_git("read-tree", tree, index_file=tmp_index) is None:
+                return False
+            result = self._run_git(
+                "checkout-index", "-f", "-z", "--stdin",
+                index_file=tmp_index,
+                input="\0".join(paths) + "\0",
+            )
+            return result is not None
+        finally:
+            tmp_index.unlink(missing_ok=True)
+
+    def _expired_snapshots(self, snaps: List[Dict]) -> List[Dict]:
+        """Return snapshots (oldest first) that violate a retention policy.
+
+        The newest snapshot is always kept. ``max_bytes`` bounds the summed
+        snapshot sizes, which over-counts blobs shared between snapshots.
+        """
+        now = datetime.now(timezone.utc)
+        kept_bytes = 0
+        expired: List[Dict] = []
+        for age_rank, meta in enumerate(reversed(snaps)):
+            kept_bytes += meta.get("size_bytes", 0)
+            if age_rank == 0:
+                continue
+            too_many = age_rank >= self.max_history
+            too_big = self.max_bytes is not None and kept_bytes > self.max_bytes
+            too_old = False
+            if self.max_age_days is not None:
+                try:
+                    created = datetime.strptime(meta["timestamp"], "%Y%m%dT%H%M%S%fZ")
+                except (KeyError, ValueError):
+                    created = None
+                if created is not None:
+                    age = now - created.replace(tzinfo=timezone.utc)
+                    too_old = age > timedelta(days=self.max_age_days)
+            if too_many or too_big or too_old:
+                expired.append(meta)
+        return list(reversed(expired))
+
     def cleanup_old_snapshots(self) -> None:
-        snaps = sorted(self.storage.glob("*/metadata.json"))
-        if len(snaps) <= self.max_history:
-            return
-        to_remove = snaps[:-self.max_history]
-        for meta in to_remove:
-            shutil.rmtree(meta.parent, ignore_errors=True)
+        """Apply the retention policies and collect what they released.
+
+        Expired snapshots are dropped from the index immediately; removing
+        their files runs in :meth:`collect_garbage`, on a background thread
+        when ``background_gc`` is set.
+        """
+        with self._lock:
+            snaps = list(self._load_index().values())
+            expired = self._expired_snapshots(snaps)
+            if not expired:
+                return
+            for meta in expired:
+                self._append_index({"event": "delete", "timestamp": meta["timestamp"]})
+            # Compact the index once deletion records dominate it
+            with self.index_file.open(encoding="utf-8") as f:
+                records = sum(1 for _ in f)
+            live = len(snaps) - len(expired)
+            if records > 2 * live + 10:
+                self._write_index(list(self._load_index().values()))
+        if self.background_gc:
+            self._gc_thread = threading.Thread(
+                target=self._pinned().collect_garbage, name="rollback-gc"
+            )
+            self._gc_thread.start()
+        else:
+            self.collect_garbage()
+
+    def _pinned(self) -> "RollbackManager":
+        """Return a copy bound to absolute paths, safe to hand to a thread.
+
+        ``root_dir`` is often relative, and the working directory may change
+        while a background collection is still running. The copy shares the
+        lock with ``self``.
+        """
+        pinned = copy.copy(self)
+        pinned.root_dir = Path(os.path.abspath(self.root_dir))
+        pinned.storage = pinned.root_dir / self.storage.name
+        pinned.objects = pinned.storage / self.objects.name
+        pinned.index_file = pinned.storage / self.index_file.name
+        return pinned
+
+    def collect_garbage(self, limit: Optional[int] = None) -> int:
+        """Delete snapshot directories and blobs the index no longer references.
 
+        At most ``limit`` entries are removed per call, so collection can run
+        incrementally; an interrupted run is simply resumed by the next one.
+        It holds the storage lock, so snapshots being written by any process
+        are never collected. Returns the number of entries removed.
+        """
+        with self._lock:
+            return self._collect_garbage(limit)
+
+    def _collect_garbage(self, limit: Optional[int]) -> int:
+        removed = 0
+        live = self._load_index()
+        for child in sorted(self.storage.iterdir()):
+            if limit is not None and removed >= limit:
+                return removed
+            if not child.is_dir() or child.name in live or not SNAPSHOT_ID.fullmatch(child.name):
+                continue
+            try:
+                backend = json.loads((child / "metadata.json").read_text()).get("backend")
+            except Exception:
+                backend = None
+            if backend == "git":
+                self._run_git("update-ref", "-d", f"refs/workflow-rollbacks/{child.name}")
+            shutil.rmtree(child, ignore_errors=True)
+            removed += 1
+
+        if not self.objects.is_dir():
+            return removed
+        refs: Dict[str, int] = {}
+        for ts, meta in live.items():
+            if meta.get("backend", "blobs") != "blobs":
+                continue
+            for entry in (self._load_manifest(ts) or {}).values():
+                if "hash" in entry:
+                    refs[entry["hash"]] = refs.get(entry["hash"], 0) + 1
+
+        for bucket in self.objects.iterdir():
+            if limit is not None and removed >= limit:
+                break
+            if not bucket.is_dir():
+                # Leftover temporary file from an interrupted snapshot
+                bucket.unlink(missing_ok=True)
+                continue
+            for blob in bucket.iterdir():
+                if limit is not None and removed >= limit:
+                    break
+                if refs.get(bucket.name + blob.name, 0) == 0:
+                    blob.unlink(missing_ok=True)
+                    removed += 1
+            try:
+                bucket.rmdir()
+            except OSError:
+                pass
+        return removed
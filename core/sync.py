@@ -0,0 +1,206 @@
+"""Incremental directory sync used to rebuild the public export.
+
+Rather than copying the whole source tree every time, :func:`sync_tree`
+builds the new tree from the previous one: files whose size, mtime and mode
+match (or, failing that, whose content hash matches) are hard-linked from the
+previous tree, keeping their inode and mtime. Only new or changed files are
+copied from the source, and files missing from the source are simply left
+behind.
+
+An :class:`ExportManifest` can be filled in along the way with the content
+hash of every file and the target of every symlink, so the result can be
+verified later without reading the source again.
+
+Hard links mean the two trees share inodes: writing to a linked file in
+place changes it in both. Trees are meant to be replaced, never edited, so
+the manifest also records each file's inode, size and mtime once the tree is
+built. A file that no longer matches them was written to since, and is
+copied from the source instead of being linked again; :meth:`ExportManifest.modified`
+lets callers check a tree before relying on it.
+"""
+
+from __future__ import annotations
+import json
+import os
+import shutil
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .utils import CHUNK_SIZE, sha256_file
+
+
+class ExportManifest:
+    """Expected contents of a tree: sha256 per file, target per symlink.
+
+    Keys are POSIX-style paths relative to the tree root. ``stats`` holds
+    ``[inode, size, mtime_ns]`` per file as recorded by :meth:`record_stats`.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, str] = {}
+        self.links: Dict[str, str] = {}
+        self.stats: Dict[str, List[int]] = {}
+
+    def paths(self) -> Set[Path]:
+        return {Path(rel) for rel in (*self.files, *self.links)}
+
+    def matches(self, root: Path, rel: Path) -> bool:
+        """Return True if ``root / rel`` has the recorded contents."""
+        key = rel.as_posix()
+        path = Path(root) / rel
+        try:
+            if key in self.links:
+                return path.is_symlink() and os.readlink(path) == self.links[key]
+            return not path.is_symlink() and sha256_file(path) == self.files.get(key)
+        except OSError:
+            return False
+
+    def record_stats(self, root: Path) -> None:
+        """Remember how every file under ``root`` looks now that it is built."""
+        self.stats = {}
+        for key in self.files:
+            try:
+                self.stats[key] = _stat_key((Path(root) / key).lstat())
+            except OSError:
+                continue
+
+    def touched(self, root: Path, rel: Path) -> bool:
+        """Return True if ``root / rel`` changed since :meth:`record_stats`."""
+        recorded = self.stats.get(Path(rel).as_posix())
+        if recorded is None:
+            return False
+        try:
+            return _stat_key((Path(root) / rel).lstat()) != recorded
+        except OSError:
+            return True
+
+    def modified(self, root: Path) -> List[str]:
+        """Return the files under ``root`` changed since :meth:`record_stats`."""
+        return sorted(key for key in self.stats if self.touched(root, Path(key)))
+
+    def save(self, path: Path) -> None:
+        data = {"files": self.files, "links": self.links, "stats": self.stats}
+        Path(path).write_text(json.dumps(data, sort_keys=True), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "ExportManifest":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        manifest = cls()
+        manifest.files = dict(data.get("files", {}))
+        manifest.links = dict(data.get("links", {}))
+        manifest.stats = dict(data.get("stats", {}))
+        return manifest
+
+
+def _stat_key(st: os.stat_result) -> List[int]:
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _copy_hashing(src: Path, dst: Path) -> str:
+    """Copy ``src`` to ``dst`` like ``shutil.copy2``, returning its sha256."""
+    hasher = sha256()
+    with src.open("rb") as fsrc, dst.open("wb") as fdst:
+        for chunk in iter(lambda: fsrc.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            fdst.write(chunk)
+    shutil.copystat(src, dst)
+    return hasher.hexdigest()
+
+
+def _unchanged(src: Path, src_st: os.stat_result, old: Path) -> bool:
+    try:
+        old_st = old.lstat()
+    except OSError:
+        return False
+    if old.is_symlink() or not old.is_file():
+        return False
+    if old_st.st_size != src_st.st_size or old_st.st_mode != src_st.st_mode:
+        return False
+    if old_st.st_mtime_ns == src_st.st_mtime_ns:
+        return True
+    try:
+        return sha256_file(src) == sha256_file(old)
+    except OSError:
+        return False
+
+
+def _link_or_copy(old: Path, src: Path, dst: Path) -> None:
+    try:
+        os.link(old, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def sync_tree(
+    source: Path,
+    previous: Optional[Path],
+    target: Path,
+    manifest: Optional[ExportManifest] = None,
+    previous_manifest: Optional[ExportManifest] = None,
+) -> List[Path]:
+    """Populate ``target`` with the contents of ``source``.
+
+    Unchanged files are hard-linked from ``previous`` when it exists.
+    ``target`` must not exist yet. Returns the relative paths that were
+    copied from ``source`` because they are new or differ from ``previous``.
+
+    ``manifest`` is filled in with what ``target`` should contain. Copied
+    files are hashed while they are copied; linked files reuse their hash
+    from ``previous_manifest`` (the manifest of ``previous``) when it has one.
+    Files ``previous_manifest`` shows were written to after ``previous`` was
+    built are copied rather than linked, so the new tree does not share them.
+    """
+    source = Path(source)
+    target = Path(target)
+    if previous is not None and not Path(previous).is_dir():
+        previous = None
+    changed: List[Path] = []
+    made_dirs = [(source, target)]
+    target.mkdir(parents=True)
+    for root, dirs, files in os.walk(source):
+        root_path = Path(root)
+        rel_root = root_path.relative_to(source)
+        out_root = target / rel_root
+        # os.walk lists symlinks to directories in ``dirs``; copy them as links
+        for name in list(dirs):
+            if (root_path / name).is_symlink():
+                dirs.remove(name)
+                files.append(name)
+            else:
+                (out_root / name).mkdir()
+                made_dirs.append((root_path / name, out_root / name))
+        for name in files:
+            src = root_path / name
+            rel = rel_root / name
+            dst = out_root / name
+            old = Path(previous) / rel if previous is not None else None
+            key = rel.as_posix()
+            if src.is_symlink():
+                link = os.readlink(src)
+                dst.symlink_to(link)
+                if manifest is not None:
+                    manifest.links[key] = link
+                if old is None or not old.is_symlink() or os.readlink(old) != link:
+                    changed.append(rel)
+                continue
+            src_st = src.stat()
+            if (
+                old is not None
+                and not (previous_manifest and previous_manifest.touched(previous, rel))
+                and _unchanged(src, src_st, old)
+            ):
+                _link_or_copy(old, src, dst)
+                if manifest is not None:
+                    digest = previous_manifest.files.get(key) if previous_manifest else None
+                    manifest.files[key] = digest or sha256_file(src)
+            else:
+                if manifest is not None:
+                    manifest.files[key] = _copy_hashing(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+                changed.append(rel)
+    # Like copytree, copy directory metadata once their contents are written
+    for src_dir, dst_dir in reversed(made_dirs):
+        shutil.copystat(src_dir, dst_dir)
+    return changed
@@ -1,9 +1,15 @@
 from __future__ import annotations
 import mimetypes
 import re
+from hashlib import sha256
 from pathlib import Path
+from typing import Iterable, List, Tuple
+
 from .constants import BINARY_EXTENSIONS, TEXT_EXTENSIONS
 
+# Bytes read at a time when hashing, copying or comparing large files
+CHUNK_SIZE = 1024 * 1024
+
 
 def _looks_binary(data: bytes) -> bool:
     if not data:
@@ -17,8 +23,7 @@ def _looks_binary(data: bytes) -> bool:
 
 def is_binary_file(path: Path, sample_size: int = 2048) -> bool:
     """Heuristically determine if ``path`` is a binary file."""
-    ext = path.suffix.lower()
-    if ext in BINARY_EXTENSIONS:
+    if path.suffix.lower() in BINARY_EXTENSIONS:
         return True
 
     try:
@@ -27,7 +32,16 @@ def is_binary_file(path: Path, sample_size: int = 2048) -> bool:
     except Exception:
         return True
 
-    if _looks_binary(chunk):
+    return is_binary_data(path, chunk, sample_size)
+
+
+def is_binary_data(path: Path, data: bytes, sample_size: int = 2048) -> bool:
+    """Like :func:`is_binary_file` for contents that were already read."""
+    ext = path.suffix.lower()
+    if ext in BINARY_EXTENSIONS:
+        return True
+
+    if _looks_binary(data[:sample_size]):
         return True
 
     mtype, _ = mimetypes.guess_type(str(path))
@@ -40,6 +54,31 @@ def is_binary_file(path: Path, sample_size: int = 2048) -> bool:
     return False
 
 
+def sha256_file(path: Path) -> str:
+    """Return the sha256 hex digest of ``path``, read in ``CHUNK_SIZE`` pieces."""
+    hasher = sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def newest_first(paths: Iterable[Path]) -> List[Path]:
+    """Sort ``paths`` by modification time, most recent first, then by path.
+
+    Fail-fast scans use this order because freshly edited files are the
+    likeliest to hold a new problem.
+    """
+
+    def key(path: Path) -> Tuple[float, Path]:
+        try:
+            return (-path.lstat().st_mtime, path)
+        except OSError:
+            return (0.0, path)
+
+    return sorted(paths, key=key)
+
+
 def sanitize_identifier(value: str) -> str:
     """Convert a value to a valid Python identifier.
 
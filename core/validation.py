@@ -0,0 +1,409 @@
+"""Single-pass template validation.
+
+:class:`ValidationEngine` walks a template once, reads every file into a
+:class:`FileBuffer` and hands that buffer to each registered check. Decoding
+and line splitting happen lazily and at most once per file, however many
+checks look at it. An optional :class:`ValidationCache` replays the findings
+of files that did not change since an earlier run.
+"""
+
+from __future__ import annotations
+import json
+import os
+import re
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .keywords import KeywordMatcher, keyword_matcher
+from .utils import is_binary_data, newest_first
+
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z0-9_]+)\s*\}\}")
+CANONICAL_KEY = re.compile(r"[A-Z0-9_]+")
+CLASS_DEF = re.compile(r'^\s*class\s+([^(:]+)', re.MULTILINE)
+FUNC_DEF = re.compile(r'^\s*(?:async\s+)?def\s+([^(:]+)', re.MULTILINE)
+IDENTIFIER_VALUE = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+PYTHON_SUFFIXES = {'.py', '.pyx', '.pyi'}
+
+# Bump when a check's findings change so cached results are discarded
+VALIDATOR_VERSION = 1
+
+
+def _universal_newlines(text: str) -> str:
+    # Match what ``Path.read_text`` returns
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+class FileBuffer:
+    """Contents of one file, with decoded views computed on first use."""
+
+    def __init__(self, path: Path, data: bytes) -> None:
+        self.path = path
+        self.data = data
+        self._resolved: Optional[Path] = None
+        self._binary: Dict[Path, bool] = {}
+        self._text: Optional[str] = None
+        self._strict: Optional[str] = None
+        self._strict_done = False
+        self._lines: Optional[List[str]] = None
+
+    @property
+    def resolved(self) -> Path:
+        """The file's real path when ``path`` is a symlink."""
+        if self._resolved is None:
+            self._resolved = self.path.resolve() if self.path.is_symlink() else self.path
+        return self._resolved
+
+    def is_binary(self, path: Optional[Path] = None) -> bool:
+        """Binary check for this content under ``path``'s name."""
+        path = path or self.path
+        if path not in self._binary:
+            self._binary[path] = is_binary_data(path, self.data)
+        return self._binary[path]
+
+    @property
+    def text(self) -> str:
+        """UTF-8 text with undecodable bytes dropped."""
+        if self._text is None:
+            self._text = _universal_newlines(self.data.decode("utf-8", errors="ignore"))
+        return self._text
+
+    @property
+    def strict_text(self) -> Optional[str]:
+        """UTF-8 text, or ``None`` if the file is not valid UTF-8."""
+        if not self._strict_done:
+            self._strict_done = True
+            try:
+                self._strict = _universal_newlines(self.data.decode("utf-8"))
+            except UnicodeDecodeError:
+                self._strict = None
+        return self._strict
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self.text.splitlines()
+        return self._lines
+
+
+class Check:
+    """Base for engine checks.
+
+    ``scan`` returns the findings for one file as JSON-serialisable data (or
+    ``None``) so they can be cached; ``apply`` merges them into the check.
+    """
+
+    name = "check"
+
+    def fingerprint(self) -> str:
+        """Settings that influence ``scan`` results, for cache keys."""
+        return ""
+
+    def scan(self, buf: FileBuffer) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def apply(self, result: Dict) -> None:
+        raise NotImplementedError
+
+    @property
+    def failed(self) -> bool:
+        """True once the check has recorded a blocking error."""
+        return False
+
+    def __call__(self, buf: FileBuffer) -> None:
+        result = self.scan(buf)
+        if result:
+            self.apply(result)
+
+
+class ValidationCache:
+    """Findings of earlier runs, keyed by file content hash.
+
+    Keys also cover :data:`VALIDATOR_VERSION`, the file's path and the
+    registered checks with their fingerprints (profile values, keywords), so
+    a change to any of them invalidates old entries. A path whose size and
+    mtime are unchanged is not even re-read. At most ``max_entries`` entries
+    are kept, least recently used first out.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 10000) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.stats: "OrderedDict[str, List]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != VALIDATOR_VERSION:
+            return
+        self.entries = OrderedDict(data.get("entries", []))
+        self.stats = OrderedDict(data.get("stats", []))
+
+    def key(self, path: str, digest: str, checks: str) -> str:
+        material = "\0".join((str(VALIDATOR_VERSION), checks, path, digest))
+        return sha256(material.encode("utf-8")).hexdigest()
+
+    def digest(self, path: Path, st: os.stat_result) -> Optional[str]:
+        """Content hash recorded for ``path`` if its size and mtime still match."""
+        stat = self.stats.get(str(path))
+        if stat and stat[0] == st.st_size and stat[1] == st.st_mtime_ns:
+            self.stats.move_to_end(str(path))
+            return stat[2]
+        return None
+
+    def get(self, key: str) -> Optional[Dict]:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, path: Path, st: os.stat_result, digest: str, key: str, results: Dict) -> None:
+        self.entries[key] = results
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.record(path, st, digest)
+
+    def record(self, path: Path, st: os.stat_result, digest: str) -> None:
+        self.stats[str(path)] = [st.st_size, st.st_mtime_ns, digest]
+        self.stats.move_to_end(str(path))
+        while len(self.stats) > self.max_entries:
+            self.stats.popitem(last=False)
+        self._dirty = True
+
+    def save(self) -> None:
+        # Hits reorder the LRU list, so save even without new entries
+        if not self._dirty and not self.hits:
+            return
+        payload = {
+            "version": VALIDATOR_VERSION,
+            "entries": list(self.entries.items()),
+            "stats": list(self.stats.items()),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+class ValidationEngine:
+    """Run every registered check over each file of a tree, reading it once."""
+
+    def __init__(self, checks: Iterable[Check] = ()) -> None:
+        self.checks: List[Check] = list(checks)
+
+    def register(self, check: Check) -> Check:
+        self.checks.append(check)
+        return check
+
+    def _scan(self, buf: FileBuffer) -> Dict:
+        return {check.name: check.scan(buf) for check in self.checks}
+
+    def _apply(self, results: Dict) -> None:
+        for check in self.checks:
+            result = results.get(check.name)
+            if result:
+                check.apply(result)
+
+    def run(
+        self, root: Path, cache: Optional[ValidationCache] = None, fail_fast: bool = False
+    ) -> None:
+        """Run the checks over every file under ``root``.
+
+        With ``fail_fast`` the most recently modified files go first and the
+        run stops after the first file that makes a check fail.
+        """
+        signature = json.dumps([[check.name, check.fingerprint()] for check in self.checks])
+        paths: Iterable[Path] = (
+            Path(dirpath) / name for dirpath, _, files in os.walk(root) for name in files
+        )
+        if fail_fast:
+            paths = newest_first(paths)
+        for path in paths:
+            self._check_file(path, cache, signature)
+            if fail_fast and any(check.failed for check in self.checks):
+                return
+
+    def _check_file(self, path: Path, cache: Optional[ValidationCache], signature: str) -> None:
+        # Symlinked files report their target's path, which the content hash
+        # does not cover
+        use_cache = cache is not None and not path.is_symlink()
+        if use_cache:
+            try:
+                st = path.stat()
+            except OSError:
+                return
+            digest = cache.digest(path, st)
+            if digest is not None:
+                results = cache.get(cache.key(str(path), digest, signature))
+                if results is not None:
+                    self._apply(results)
+                    return
+        try:
+            data = path.read_bytes()
+        except OSError:
+            # Broken symlinks and unreadable files have nothing to check
+            return
+        buf = FileBuffer(path, data)
+        if not use_cache:
+            for check in self.checks:
+                check(buf)
+            return
+        digest = sha256(data).hexdigest()
+        key = cache.key(str(path), digest, signature)
+        results = cache.get(key)
+        if results is None:
+            results = self._scan(buf)
+            cache.put(path, st, digest, key, results)
+        else:
+            cache.record(path, st, digest)
+        self._apply(results)
+
+
+class PlaceholderCheck(Check):
+    """Collect placeholders, their locations and style problems."""
+
+    name = "placeholders"
+
+    def __init__(self) -> None:
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.placeholders: Set[str] = set()
+        self.styles: Set[str] = set()
+        self.locations: Dict[str, List[Tuple[str, int]]] = {}
+
+    def scan(self, buf: FileBuffer) -> Optional[Dict]:
+        path = buf.resolved
+        errors: List[str] = []
+        warnings: List[str] = []
+        found: List[List] = []
+        if buf.is_binary(path):
+            if b"{{" in buf.data and b"}}" in buf.data:
+                errors.append(f"Placeholder found in binary file: {path}")
+            return {"errors": errors} if errors else None
+        text = buf.text
+        if "{{ {{" in text:
+            errors.append(f"Nested placeholder found in {path}")
+        if "{{" in text:
+            for lineno, line in enumerate(buf.lines, 1):
+                if "{{" not in line:
+                    continue
+                for m in PLACEHOLDER.finditer(line):
+                    key = m.group(1)
+                    found.append([key, m.group(0).replace(key, "KEY"), str(path), lineno])
+                    if not CANONICAL_KEY.fullmatch(key):
+                        warnings.append(f"Inconsistent placeholder '{key}' in {path}")
+        if not (errors or warnings or found):
+            return None
+        return {"errors": errors, "warnings": warnings, "found": found}
+
+    def apply(self, result: Dict) -> None:
+        self.errors.extend(result.get("errors", []))
+        self.warnings.extend(result.get("warnings", []))
+        for key, style, path, lineno in result.get("found", []):
+            self.placeholders.add(key)
+            self.styles.add(style)
+            self.locations.setdefault(key, []).append((path, lineno))
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+
+class IdentifierCheck(Check):
+    """Flag profile values that cannot appear in Python class or def names."""
+
+    name = "identifiers"
+
+    def __init__(self, profile_data: Dict[str, str]) -> None:
+        self.profile_data = profile_data
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+    def fingerprint(self) -> str:
+        data = json.dumps({k: str(v) for k, v in self.profile_data.items()}, sort_keys=True)
+        return sha256(data.encode("utf-8")).hexdigest()
+
+    def scan(self, buf: FileBuffer) -> Optional[Dict]:
+        if buf.path.suffix not in PYTHON_SUFFIXES:
+            return None
+        text = buf.strict_text
+        if text is None or "{{" not in text:
+            return None
+        errors: List[str] = []
+        warnings: List[str] = []
+        for pattern, kind in ((CLASS_DEF, "class"), (FUNC_DEF, "def")):
+            for m in pattern.finditer(text):
+                for ph in PLACEHOLDER.finditer(m.group(1)):
+                    key = ph.group(1)
+                    if key not in self.profile_data:
+                        continue
+                    value = str(self.profile_data[key])
+                    if not IDENTIFIER_VALUE.match(value.replace(' ', '')):
+                        errors.append(
+                            f"{buf.path}: Placeholder '{key}' in {kind} name contains invalid identifier value: '{value}'"
+                        )
+                    elif ' ' in value:
+                        warnings.append(
+                            f"{buf.path}: Placeholder '{key}' in {kind} name contains spaces: '{value}' - consider using a separate identifier key"
+                        )
+        if not (errors or warnings):
+            return None
+        return {"errors": errors, "warnings": warnings}
+
+    def apply(self, result: Dict) -> None:
+        self.errors.extend(result["errors"])
+        self.warnings.extend(result["warnings"])
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+
+class PrivateReferenceCheck(Check):
+    """Record up to ``limit`` lines per file containing a private keyword."""
+
+    name = "private"
+
+    def __init__(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        limit: int = 3,
+        matcher: Optional[KeywordMatcher] = None,
+    ) -> None:
+        if matcher is None:
+            matcher = keyword_matcher() if keywords is None else KeywordMatcher(keywords)
+        self.matcher = matcher
+        self.limit = limit
+        self.hits: Dict[str, List[Tuple[int, str, str]]] = {}
+
+    def fingerprint(self) -> str:
+        return json.dumps([self.matcher.keywords, self.limit])
+
+    def scan(self, buf: FileBuffer) -> Optional[Dict]:
+        if buf.is_binary() or not self.matcher.search(buf.text):
+            return None
+        found: List[List] = []
+        for idx, line in enumerate(buf.lines, 1):
+            if len(found) >= self.limit:
+                break
+            kw = self.matcher.first(line)
+            if kw is not None:
+                found.append([idx, line, kw])
+        return {"path": str(buf.path), "hits": found} if found else None
+
+    def apply(self, result: Dict) -> None:
+        self.hits[result["path"]] = [tuple(hit) for hit in result["hits"]]
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.hits)
@@ -17,6 +17,7 @@ if __package__ is None:
     sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core.constants import TEXT_EXTENSIONS
+from core.journal import WriteJournal
 from core.utils import is_binary_file, sanitize_identifier
 
 
@@ -52,7 +53,11 @@ def _get_key_line_numbers(content: str) -> Dict[str, int]:
 
 
 def validate_profile_values(
-    data: Dict[str, str], line_map: Dict[str, int], content: str, path: Path
+    data: Dict[str, str],
+    line_map: Dict[str, int],
+    content: str,
+    path: Path,
+    journal: Optional[WriteJournal] = None,
 ) -> None:
     """Validate loaded profile values and optionally fix common issues."""
 
@@ -117,19 +122,51 @@ def validate_profile_values(
         text = "\n".join(lines)
         if not text.endswith("\n"):
             text += "\n"
-        path.write_text(text, encoding="utf-8")
+        if journal is not None:
+            journal.write_text(path, text)
+        else:
+            path.write_text(text, encoding="utf-8")
         return
 
     raise ValueError("Invalid profile entries")
 
 
-def load_profile(path: Path) -> Dict[str, str]:
-    """Load YAML profile using proper YAML parser."""
+def load_profile(path: Path, journal: Optional[WriteJournal] = None) -> Dict[str, str]:
+    """Load YAML profile using proper YAML parser.
+
+    Auto-fixes to the profile are written through ``journal`` when given.
+    """
     if not path.exists():
         return {}
 
     content = path.read_text(encoding="utf-8")
+    data = _parse_profile(path, content)
+    line_map = _get_key_line_numbers(content)
+    validate_profile_values(data, line_map, content, path, journal)
+
+    return data
 
+
+def read_profile(path: Path) -> Dict[str, str]:
+    """Return the values of profile ``path`` as they are, without validating them.
+
+    For scanners: nothing is printed, prompted for or rewritten. A malformed
+    profile exits with its error message.
+    """
+    if not path.exists():
+        return {}
+    try:
+        content = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise SystemExit(f"❌ Cannot read profile {path}: {e}")
+    try:
+        return _parse_profile(path, content)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def _parse_profile(path: Path, content: str) -> Dict[str, str]:
+    """Parse profile ``content`` read from ``path`` into a key/value mapping."""
     data = None
     if yaml is not None:
         try:
@@ -171,20 +208,22 @@ def load_profile(path: Path) -> Dict[str, str]:
                 )
             if not isinstance(value, str):
                 data[key] = str(value)
-
-    line_map = _get_key_line_numbers(content)
-    validate_profile_values(data, line_map, content, path)
-
     return data
 
 
-def copy_project(src: Path, dst: Path) -> None:
+def copy_project(src: Path, dst: Path, journal: Optional[WriteJournal] = None) -> None:
     """Copy ``src`` directory tree to ``dst``."""
+    if journal is not None:
+        journal.create_dir(dst)
     shutil.copytree(src, dst)
 
 
 def overlay_files(
-    overlay_dir: Path, target_dir: Path, log_file: Path, verbose: bool
+    overlay_dir: Path,
+    target_dir: Path,
+    log_file: Path,
+    verbose: bool,
+    journal: Optional[WriteJournal] = None,
 ) -> None:
     """Overlay files with symlink security checks."""
     for root, dirs, files in os.walk(overlay_dir):
@@ -206,15 +245,30 @@ def overlay_files(
                     )
                     continue
 
+                if journal is not None:
+                    journal.symlink(os.readlink(src_path), dst_path)
+                    continue
                 dst_path.parent.mkdir(parents=True, exist_ok=True)
                 dst_path.symlink_to(os.readlink(src_path))
+            elif journal is not None:
+                journal.copy_file(src_path, dst_path)
             else:
                 dst_path.parent.mkdir(parents=True, exist_ok=True)
                 shutil.copy2(src_path, dst_path)
 
 
-def replace_tokens(base_dir: Path, mapping: Dict[str, str], log_file: Path, verbose: bool) -> None:
-    """Replace ``{{ KEY }}`` tokens in text files under ``base_dir``."""
+def replace_tokens(
+    base_dir: Path,
+    mapping: Dict[str, str],
+    log_file: Path,
+    verbose: bool,
+    journal: Optional[WriteJournal] = None,
+) -> None:
+    """Replace ``{{ KEY }}`` tokens in text files under ``base_dir``.
+
+    With a ``journal`` each rendered file is written to a temporary sibling
+    and renamed into place.
+    """
     # Create patterns for both regular and identifier-safe replacements
     patterns = {
         key: re.compile(r"\{\{\s*" + re.escape(key) + r"\s*\}\}")
@@ -285,7 +339,10 @@ def replace_tokens(base_dir: Path, mapping: Dict[str, str], log_file: Path, verb
                         changed = True
 
                 if changed:
-                    path.write_text("".join(lines), encoding="utf-8")
+                    if journal is not None:
+                        journal.write_text(path, "".join(lines))
+                    else:
+                        path.write_text("".join(lines), encoding="utf-8")
 
 
 def inject_context(
@@ -296,13 +353,18 @@ def inject_context(
     *,
     log_file: Path = Path(os.devnull),
     verbose: bool = False,
+    journal: Optional[WriteJournal] = None,
 ) -> None:
-    """Copy project and replace tokens using profile, applying optional overlay."""
-    copy_project(src, dst)
+    """Copy project and replace tokens using profile, applying optional overlay.
+
+    Passing a ``journal`` makes every write undoable with
+    :meth:`WriteJournal.rollback`; the caller commits it on success.
+    """
+    copy_project(src, dst, journal)
     if overlay:
-        overlay_files(overlay, dst, log_file, verbose)
-    mapping = load_profile(profile)
-    replace_tokens(dst, mapping, log_file, verbose)
+        overlay_files(overlay, dst, log_file, verbose, journal)
+    mapping = load_profile(profile, journal)
+    replace_tokens(dst, mapping, log_file, verbose, journal)
 
 
 def parse_args() -> argparse.Namespace:
@@ -5,30 +5,36 @@ import os
 import shutil
 import sys
 from pathlib import Path
+from typing import Optional
 
 # Ensure this script works when executed directly from the ``scripts`` folder.
 if __package__ is None:
     sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from scripts.apply_template_context import get_log_file, write_log
-from core.constants import KEYWORDS, TEXT_EXTENSIONS
+from core.config import DEFAULT_CONFIG, load_config
+from core.constants import TEXT_EXTENSIONS
+from core.keywords import KeywordMatcher, keyword_matcher
 from core.utils import is_binary_file
 
 
-def should_filter_line(line: str) -> bool:
+def should_filter_line(line: str, matcher: Optional[KeywordMatcher] = None) -> bool:
     """Return True if the line contains any of the keywords.
 
     Matching is performed case-insensitively to catch variations like
-    ``yourcompany`` or ``My_Organization_Name``.
+    ``yourcompany`` or ``My_Organization_Name``. ``matcher`` defaults to the
+    built-in keywords.
     """
-    lower = line.lower()
-    for kw in KEYWORDS:
-        if kw.lower() in lower:
-            return True
-    return False
+    return (matcher or keyword_matcher()).search(line)
 
 
-def copy_and_clean_file(src: Path, dst: Path, log_file: Path, verbose: bool) -> None:
+def copy_and_clean_file(
+    src: Path,
+    dst: Path,
+    log_file: Path,
+    verbose: bool,
+    matcher: Optional[KeywordMatcher] = None,
+) -> None:
     """Copy ``src`` to ``dst`` removing lines with keywords for text files."""
     dst.parent.mkdir(parents=True, exist_ok=True)
     if is_binary_file(src):
@@ -38,7 +44,7 @@ def copy_and_clean_file(src: Path, dst: Path, log_file: Path, verbose: bool) ->
     if src.suffix in TEXT_EXTENSIONS:
         with src.open("r", errors="ignore") as f_src, dst.open("w") as f_dst:
             for lineno, line in enumerate(f_src, start=1):
-                if not should_filter_line(line):
+                if not should_filter_line(line, matcher):
                     f_dst.write(line)
                 else:
                     write_log(f"{src}:{lineno} removed line", log_file, verbose)
@@ -51,6 +57,7 @@ def export_directory(
     dst_dir: Path,
     log_file: Path = Path(os.devnull),
     verbose: bool = False,
+    matcher: Optional[KeywordMatcher] = None,
 ) -> None:
     """Walk ``src_dir`` copying files to ``dst_dir``."""
     for root, dirs, files in os.walk(src_dir):
@@ -58,7 +65,7 @@ def export_directory(
             src_path = Path(root) / name
             rel_path = src_path.relative_to(src_dir)
             dst_path = dst_dir / rel_path
-            copy_and_clean_file(src_path, dst_path, log_file, verbose)
+            copy_and_clean_file(src_path, dst_path, log_file, verbose, matcher)
 
 
 def parse_args() -> argparse.Namespace:
@@ -66,13 +73,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("src", type=Path, help="Source directory")
     parser.add_argument("dst", type=Path, help="Target directory")
     parser.add_argument("--verbose", action="store_true", help="Print log to stdout")
+    parser.add_argument(
+        "--config", type=Path, default=DEFAULT_CONFIG, help="Workflow config with extra keywords"
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    cfg = load_config(args.config) if args.config.exists() else {}
     log_file = get_log_file("export")
-    export_directory(args.src, args.dst, log_file, args.verbose)
+    export_directory(args.src, args.dst, log_file, args.verbose, keyword_matcher(cfg))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+"""Scan staged files for sensitive content, as a git pre-commit hook.
+
+Only the blobs in the index are read, never the working tree. This module
+is the hook's whole import path, so it stays clear of the rollback store
+and template validation that ``workflow.py`` sets up.
+
+Install it with::
+
+    printf '#!/bin/sh\\nexec python conversion-tools/scripts/precommit.py\\n' > .git/hooks/pre-commit
+    chmod +x .git/hooks/pre-commit
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+if __package__ is None:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.config import DEFAULT_CONFIG, load_config
+from core.history import TextScanner, cat_file_batch, fingerprint
+from core.keywords import keyword_matcher
+from core.leaks import ProfileLeakScanner
+from core.utils import is_binary_data
+from scripts.apply_template_context import read_profile
+from scripts.validate_public_repo import PATTERNS, scan_text
+
+
+def content_scanner(cfg: dict) -> Tuple[TextScanner, str]:
+    """Return a text scanner for ``PATTERNS`` plus profile values, and its fingerprint."""
+    profile = {}
+    if cfg.get('placeholder_values'):
+        profile = read_profile(Path(cfg['placeholder_values']))
+    leaks = ProfileLeakScanner(profile)
+
+    def scan(text: str, label: str) -> List[str]:
+        return scan_text(text, label) + leaks.report(text, label)
+
+    leak_pattern = leaks.pattern.pattern if leaks.pattern is not None else ""
+    return scan, fingerprint(*(regex.pattern for regex, _ in PATTERNS), leak_pattern)
+
+
+def staged_files(repo: Path) -> List[Tuple[str, bytes]]:
+    """Return ``(path, contents)`` for files added or modified in the index."""
+    result = subprocess.run(
+        ["git", "diff", "--cached", "--raw", "-z", "--no-abbrev", "--diff-filter=ACMRT"],
+        cwd=repo,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"❌ Not a git repository: {repo}")
+    # Records are ":<modes> <old> <new> <status>\0<path>\0", with a second
+    # path for renames and copies. Blob ids go to cat-file, so paths may hold
+    # any character, newlines included.
+    fields = os.fsdecode(result.stdout).split("\0")
+    entries: List[Tuple[str, str]] = []
+    i = 0
+    while i < len(fields) - 1:
+        meta = fields[i].split()
+        status = meta[4]
+        i += 3 if status[0] in "RC" else 2
+        entries.append((fields[i - 1], meta[3]))
+    if not entries:
+        return []
+    staged = []
+    blobs = cat_file_batch(repo, [oid for _, oid in entries])
+    for (name, _), (_, data) in zip(entries, blobs):
+        if data is not None:
+            staged.append((name, data))
+    return staged
+
+
+def scan_staged(staged: List[Tuple[str, bytes]], cfg: dict) -> List[str]:
+    """Return report lines for ``PATTERNS``, keywords and profile values in ``staged``."""
+    texts = [(name, data) for name, data in staged if not is_binary_data(Path(name), data)]
+    if not texts:
+        return []
+    scan, _ = content_scanner(cfg)
+    matcher = keyword_matcher(cfg)
+    findings: List[str] = []
+    for name, data in texts:
+        text = data.decode("utf-8", errors="ignore")
+        findings.extend(scan(text, name))
+        if not matcher.search(text):
+            continue
+        for idx, line in enumerate(text.splitlines(), 1):
+            kw = matcher.first(line)
+            if kw is not None:
+                findings.append(f"{name}:{idx}: Private keyword \"{kw}\" -> {line.strip()}")
+    return findings
+
+
+def run(repo: Path, config: Path) -> None:
+    staged = staged_files(repo)
+    findings: List[str] = []
+    if staged:
+        cfg = load_config(config) if config.exists() else {}
+        findings = scan_staged(staged, cfg)
+    for line in findings:
+        print(line)
+    if findings:
+        raise SystemExit(f"❌ Sensitive content in staged files ({len(findings)} finding{'s' if len(findings) != 1 else ''})")
+    print(f"✓ Checked {len(staged)} staged file{'s' if len(staged) != 1 else ''}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scan staged files for sensitive content")
+    parser.add_argument("--repo", type=Path, default=Path("."), help="Repository whose index is scanned")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    run(args.repo, args.config)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+import argparse
+import io
 import re
 import sys
+import time
+from collections import deque
 from pathlib import Path
-from typing import Iterable, Tuple, List, Pattern
+from typing import Deque, Generator, Iterable, Iterator, Optional, Tuple, List, Pattern
+
+if __package__ is None:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.leaks import ProfileLeakScanner
+from core.utils import newest_first
+from scripts.apply_template_context import read_profile
 
 
 COMPANY_PATTERNS = [
@@ -36,31 +47,280 @@ def build_patterns() -> Iterable[Tuple[Pattern, str]]:
 PATTERNS = list(build_patterns())
 
 
+def _existence_form(pattern: str) -> str:
+    """Return a pattern that matches the same lines as ``pattern``, in linear time.
+
+    Scanning only asks whether a line matches, so a repeated character class
+    at either end can be cut to one occurrence: ``[\\w.-]+@[\\w.-]+`` matches
+    exactly where ``[\\w.-]@[\\w.-]`` does. Without the leading repeat the
+    regex engine no longer rescans a long run of word characters from every
+    position in it.
+    """
+    pattern = re.sub(r"^(\[[^\]]*\])\+", r"\1", pattern)
+    return re.sub(r"(?<!\\)\+$", "", pattern)
+
+
+# What the scanners actually search, in ``PATTERNS`` order
+DETECTORS: List[Tuple[Pattern, str]] = [
+    (re.compile(_existence_form(regex.pattern), regex.flags), desc) for regex, desc in PATTERNS
+]
+
+# Lowercase literals each pattern cannot match without, in ``PATTERNS`` order.
+# Substring tests are far cheaper than regex searches, so a pattern is only
+# searched for when all of its literals are present.
+REQUIRED_LITERALS: List[Tuple[str, ...]] = (
+    [(re.sub(r"\\(.)", r"\1", p).lower(),) for p in COMPANY_PATTERNS]
+    + [
+        ("@",),
+        (".",),
+        ("token",),
+        ("api", "key", "="),
+        ("secret", "="),
+        ("password",),
+        ("aws_secret_access_key", "="),
+        ("-----begin", "private key-----"),
+        ("ssh-rsa",),
+    ]
+)
+_CHECKS = list(zip(DETECTORS, REQUIRED_LITERALS))
+# Non-ASCII letters that IGNORECASE matches against ASCII ones
+_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+# Longer lines (minified code, inline blobs) are searched in windows of this
+# many characters, each overlapping the previous one by WINDOW_OVERLAP so a
+# match across a window boundary is still found
+MAX_LINE_LENGTH = 8192
+WINDOW_OVERLAP = 512
+# Seconds spent on one file before it is abandoned and reported
+FILE_TIME_BUDGET = 30.0
+# Characters of an overlong line shown in a report
+REPORT_WIDTH = 200
+
+
+def _lower(text: str) -> str:
+    return text.lower() if text.isascii() else text.translate(_FOLD).lower()
+
+
+def _candidate_checks(
+    text: str, deadline: Optional[float] = None
+) -> List[Tuple[Tuple[Pattern, str], Tuple[str, ...]]]:
+    """Return the checks that match somewhere in ``text``.
+
+    A pattern matching one of its lines also matches the whole text, so any
+    other pattern can be skipped for every line. The text is searched in
+    windows of twice ``MAX_LINE_LENGTH``, one starting every
+    ``MAX_LINE_LENGTH`` characters, so each span :func:`match_line` can match
+    lies wholly inside one and no single search covers the whole text. Once
+    ``deadline`` passes, every check not yet ruled out is returned.
+    """
+    lowered = _lower(text)
+    pending = [i for i, check in enumerate(_CHECKS) if all(lit in lowered for lit in check[1])]
+    hits: List[int] = []
+    for start in range(0, max(len(text) - MAX_LINE_LENGTH, 1), MAX_LINE_LENGTH):
+        if not pending:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            hits.extend(pending)
+            break
+        window = text[start:start + 2 * MAX_LINE_LENGTH]
+        for i in [i for i in pending if _CHECKS[i][0][0].search(window)]:
+            pending.remove(i)
+            hits.append(i)
+    return [_CHECKS[i] for i in sorted(hits)]
+
+
+def _windows(line: str) -> Iterator[str]:
+    if len(line) <= MAX_LINE_LENGTH:
+        yield line
+        return
+    step = MAX_LINE_LENGTH - WINDOW_OVERLAP
+    for start in range(0, len(line) - WINDOW_OVERLAP, step):
+        yield line[start:start + MAX_LINE_LENGTH]
+
+
+def match_line(line: str, checks=None) -> List[str]:
+    """Return the description of every pattern matching ``line``, in order."""
+    checks = _CHECKS if checks is None else checks
+    matched = [False] * len(checks)
+    for window in _windows(line):
+        lowered = _lower(window)
+        for i, ((regex, _), literals) in enumerate(checks):
+            # The literal test is the cheap anchor: the regex only runs on
+            # windows that contain everything it needs
+            if not matched[i] and all(lit in lowered for lit in literals):
+                matched[i] = regex.search(window) is not None
+    return [desc for ((_, desc), _), hit in zip(checks, matched) if hit]
+
+
+def _excerpt(line: str) -> str:
+    line = line.strip()
+    return line if len(line) <= MAX_LINE_LENGTH else line[:REPORT_WIDTH] + "..."
+
+
+def scan_text(text: str, label: str, budget: Optional[float] = None) -> List[str]:
+    """Return report lines for every sensitive match in ``text``.
+
+    ``label`` names the source (usually a path) in each line. A scan taking
+    longer than ``budget`` seconds is abandoned, which is reported as a
+    finding of its own since the rest of the text went unchecked.
+    """
+    deadline = None if budget is None else time.monotonic() + budget
+    checks = _candidate_checks(text, deadline)
+    if not checks:
+        return []
+    found = []
+    for lineno, line in enumerate(io.StringIO(text), start=1):
+        if deadline is not None and time.monotonic() > deadline:
+            found.append(f"{label}:{lineno}: Scan abandoned after {budget:g}s")
+            break
+        for desc in match_line(line, checks):
+            found.append(f"{label}:{lineno}: {desc} -> {_excerpt(line)}")
+    return found
+
+
+def _findings(
+    path: Path, budget: Optional[float] = FILE_TIME_BUDGET, label: Optional[str] = None
+) -> List[str]:
+    """Return the report lines for every sensitive match in ``path``.
+
+    Lines name the file ``label``, or ``path`` itself by default.
+    """
+    with path.open("r", errors="ignore") as f:
+        return scan_text(f.read(), str(path) if label is None else label, budget)
+
+
 def scan_file(path: Path) -> bool:
     """Return True if no sensitive patterns found in file."""
-    ok = True
-    with path.open("r", errors="ignore") as f:
-        for lineno, line in enumerate(f, start=1):
-            for regex, desc in PATTERNS:
-                if regex.search(line):
-                    print(f"{path}:{lineno}: {desc} -> {line.strip()}")
-                    ok = False
-    return ok
+    found = _findings(path)
+    for line in found:
+        print(line)
+    return not found
+
+
+_stop = None
+_fail_fast = False
+_budget: Optional[float] = None
 
 
-def validate_directory(base_dir: Path) -> bool:
-    """Scan all files under ``base_dir`` and report sensitive data."""
+def _init_worker(stop, fail_fast: bool, budget: Optional[float]) -> None:
+    global _stop, _fail_fast, _budget
+    _stop = stop
+    _fail_fast = fail_fast
+    _budget = budget
+
+
+def _scan_chunk(paths: List[Tuple[Path, str]]) -> List[List[str]]:
+    """Scan ``(path, label)`` pairs in a worker, stopping early once any worker failed fast."""
+    results = []
+    for path, label in paths:
+        if _stop.is_set():
+            break
+        found = _findings(path, _budget, label)
+        results.append(found)
+        if found and _fail_fast:
+            _stop.set()
+            break
+    return results
+
+
+def _scan_parallel(
+    files: List[Tuple[Path, str]], workers: int, chunk_size: int, fail_fast: bool, budget: Optional[float]
+) -> Iterator[List[str]]:
+    """Yield findings per ``(path, label)`` in ``files`` order, scanning in a process pool.
+
+    At most ``2 * workers`` chunks are in flight so memory stays bounded.
+    """
+    # Imported here to keep them off the start-up path of the pre-commit hook
+    import multiprocessing
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    chunks = (files[i:i + chunk_size] for i in range(0, len(files), chunk_size))
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(stop, fail_fast, budget)
+    )
+    pending: Deque[Future] = deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.submit(_scan_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Also reached when the caller stops early: tell running workers to
+        # stop and drop chunks that have not started
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def validate_directory(
+    base_dir: Path,
+    workers: int = 1,
+    fail_fast: bool = False,
+    chunk_size: int = 64,
+    budget: Optional[float] = FILE_TIME_BUDGET,
+    label: Optional[Path] = None,
+) -> bool:
+    """Scan all files under ``base_dir`` and report sensitive data.
+
+    Files are scanned in sorted path order, in ``workers`` processes when it
+    is more than one, and findings are printed in that order. ``fail_fast``
+    scans the most recently modified files first instead and stops every
+    worker at the first finding; with several workers that need not be the
+    first file in that order. A file taking more than ``budget`` seconds
+    is abandoned and reported. Findings name files as if ``base_dir`` were
+    ``label``, e.g. the path an export will be moved to.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    files = [f for f in base_dir.rglob("*") if f.is_file()]
+    files = newest_first(files) if fail_fast else sorted(files)
+    labelled = [
+        (f, str(f if label is None else Path(label) / f.relative_to(base_dir))) for f in files
+    ]
+    if workers == 1 or len(files) <= chunk_size:
+        results: Generator[List[str], None, None] = (_findings(f, budget, name) for f, name in labelled)
+    else:
+        results = _scan_parallel(labelled, workers, chunk_size, fail_fast, budget)
     ok = True
-    for file in base_dir.rglob("*"):
-        if file.is_file():
-            if not scan_file(file):
+    try:
+        for found in results:
+            for line in found:
+                print(line)
+            if found:
                 ok = False
+                if fail_fast:
+                    break
+    finally:
+        results.close()
     return ok
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scan an export for sensitive data")
+    parser.add_argument("base", type=Path, nargs="?", default=Path("clean_export"))
+    parser.add_argument("--workers", type=int, default=1, help="Scan in this many processes")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first finding")
+    parser.add_argument("--profile", type=Path, help="Also search for this profile's values")
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=FILE_TIME_BUDGET,
+        help="Seconds spent on one file before it is abandoned and reported",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
-    base = Path("clean_export")
-    success = validate_directory(base)
+    args = parse_args()
+    success = validate_directory(
+        args.base, workers=args.workers, fail_fast=args.fail_fast, budget=args.time_budget
+    )
+    if args.profile and (success or not args.fail_fast):
+        scanner = ProfileLeakScanner(read_profile(args.profile))
+        success &= scanner.scan_directory(args.base, fail_fast=args.fail_fast)
     if not success:
         sys.exit(1)
 
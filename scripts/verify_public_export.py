@@ -1,5 +1,6 @@
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Iterable, List, Optional, Tuple
 
@@ -7,61 +8,109 @@ if __package__ is None:
     import sys
     sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from core.constants import KEYWORDS
-from core.utils import is_binary_file
+from core.config import DEFAULT_CONFIG, load_config
+from core.keywords import KeywordMatcher, keyword_matcher
+from core.sync import ExportManifest
+from core.utils import CHUNK_SIZE, is_binary_file, newest_first
 
 
 Result = Tuple[bool, List[str], List[str]]  # ok, errors, warnings
 
 
-def _clean_lines(lines: Iterable[str]) -> List[str]:
-    cleaned = []
-    for line in lines:
-        lower = line.lower()
-        if any(kw.lower() in lower for kw in KEYWORDS):
-            continue
-        cleaned.append(line)
-    return cleaned
+def _clean_lines(lines: Iterable[str], matcher: Optional[KeywordMatcher] = None) -> List[str]:
+    matcher = matcher or keyword_matcher()
+    return [line for line in lines if not matcher.search(line)]
 
 
-def _compare_files(template_file: Path, export_file: Path) -> Tuple[bool, Optional[str]]:
+def _same_bytes(a: Path, b: Path) -> bool:
+    """Return True if ``a`` and ``b`` have identical contents.
+
+    Sizes are compared first; only equal-sized files are read, in chunks, and
+    reading stops at the first difference.
+    """
+    sa, sb = a.stat(), b.stat()
+    if os.path.samestat(sa, sb):
+        return True
+    if sa.st_size != sb.st_size:
+        return False
+    with a.open("rb") as fa, b.open("rb") as fb:
+        while True:
+            ca = fa.read(CHUNK_SIZE)
+            if ca != fb.read(CHUNK_SIZE):
+                return False
+            if not ca:
+                return True
+
+
+def _compare_files(
+    template_file: Path, export_file: Path, matcher: Optional[KeywordMatcher] = None
+) -> Tuple[bool, Optional[str]]:
     """Compare two files. Return (match, reason).
     reason is 'cleaned' if export_file matches template_file with keyword lines removed.
     """
     if template_file.is_symlink() or export_file.is_symlink():
         return (os.readlink(template_file) == os.readlink(export_file), None)
 
+    if _same_bytes(template_file, export_file):
+        return (True, None)
+
     if is_binary_file(template_file):
-        return (template_file.read_bytes() == export_file.read_bytes(), None)
+        return (False, None)
 
+    # Text can still match line for line, e.g. with other line endings
     t_lines = template_file.read_text(encoding="utf-8", errors="ignore").splitlines()
     e_lines = export_file.read_text(encoding="utf-8", errors="ignore").splitlines()
 
     if t_lines == e_lines:
         return (True, None)
 
-    if _clean_lines(t_lines) == e_lines:
+    if _clean_lines(t_lines, matcher) == e_lines:
         return (False, "cleaned")
 
     return (False, "mismatch")
 
 
 def verify_public_export(
-    template_dir: Path, export_dir: Path, overlay_manifest: Optional[List[Path]] = None
+    template_dir: Path,
+    export_dir: Path,
+    overlay_manifest: Optional[List[Path]] = None,
+    fail_fast: bool = False,
+    expected: Optional[ExportManifest] = None,
+    workers: Optional[int] = None,
+    matcher: Optional[KeywordMatcher] = None,
 ) -> bool:
-    """Verify that ``export_dir`` matches ``template_dir`` excluding overlay files."""
+    """Verify that ``export_dir`` matches ``template_dir`` excluding overlay files.
+
+    With ``expected`` (the manifest written while the export was built) the
+    export is checked against its recorded hashes and ``template_dir`` is
+    not read at all. Files are compared in ``workers`` threads. ``matcher``
+    holds the keywords whose lines an export may have dropped.
+
+    ``fail_fast`` skips the content comparison when files are missing or
+    unexpected, compares the most recently modified export files first and
+    stops at the first mismatch.
+    """
     overlay_set = {Path(p) for p in overlay_manifest or []}
 
-    template_files = {
-        p.relative_to(template_dir)
-        for p in template_dir.rglob("*")
-        if p.is_file() and p.relative_to(template_dir) not in overlay_set
-    }
-    export_files = {
-        p.relative_to(export_dir)
-        for p in export_dir.rglob("*")
-        if p.is_file()
-    }
+    if expected is not None:
+        template_files = expected.paths() - overlay_set
+        # Symlinks are part of the manifest, including those to directories
+        export_files = {
+            p.relative_to(export_dir)
+            for p in export_dir.rglob("*")
+            if p.is_file() or p.is_symlink()
+        }
+    else:
+        template_files = {
+            p.relative_to(template_dir)
+            for p in template_dir.rglob("*")
+            if p.is_file() and p.relative_to(template_dir) not in overlay_set
+        }
+        export_files = {
+            p.relative_to(export_dir)
+            for p in export_dir.rglob("*")
+            if p.is_file()
+        }
 
     errors: List[str] = []
     warnings: List[str] = []
@@ -78,15 +127,30 @@ def verify_public_export(
             errors.append(f"Unexpected file: {rel}")
 
     matched = template_files & export_files
-    for rel in sorted(matched):
-        t_file = template_dir / rel
-        e_file = export_dir / rel
-        same, reason = _compare_files(t_file, e_file)
-        if not same:
-            if reason == "cleaned":
-                warnings.append(f"{rel} has cleaned lines")
-            else:
-                errors.append(f"{rel} content mismatch")
+    if fail_fast:
+        order = [] if errors else [
+            p.relative_to(export_dir) for p in newest_first(export_dir / rel for rel in matched)
+        ]
+    else:
+        order = sorted(matched)
+
+    def compare(rel: Path) -> Tuple[bool, Optional[str]]:
+        if expected is not None:
+            return (expected.matches(export_dir, rel), None)
+        return _compare_files(template_dir / rel, export_dir / rel, matcher)
+
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+    try:
+        for rel, (same, reason) in zip(order, pool.map(compare, order)):
+            if not same:
+                if reason == "cleaned":
+                    warnings.append(f"{rel} has cleaned lines")
+                else:
+                    errors.append(f"{rel} content mismatch")
+                    if fail_fast:
+                        break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
     for msg in errors:
         print(f"\u2717 Error: {msg}")
@@ -103,6 +167,14 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("template", type=Path)
     parser.add_argument("export", type=Path)
     parser.add_argument("--overlay-manifest", type=Path, help="Path to .overlay_manifest")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first mismatch")
+    parser.add_argument(
+        "--expected", type=Path, help="Check against this export manifest instead of the template"
+    )
+    parser.add_argument("--workers", type=int, help="Threads comparing files")
+    parser.add_argument(
+        "--config", type=Path, default=DEFAULT_CONFIG, help="Workflow config with extra keywords"
+    )
     return parser.parse_args()
 
 
@@ -111,7 +183,17 @@ def main() -> None:
     overlay_files = None
     if args.overlay_manifest and args.overlay_manifest.exists():
         overlay_files = [Path(line.strip()) for line in args.overlay_manifest.read_text(encoding="utf-8").splitlines() if line.strip()]
-    ok = verify_public_export(args.template, args.export, overlay_files)
+    cfg = load_config(args.config) if args.config.exists() else {}
+    expected = ExportManifest.load(args.expected) if args.expected else None
+    ok = verify_public_export(
+        args.template,
+        args.export,
+        overlay_files,
+        fail_fast=args.fail_fast,
+        expected=expected,
+        workers=args.workers,
+        matcher=keyword_matcher(cfg),
+    )
     if not ok:
         raise SystemExit(1)
 
@@ -42,7 +42,7 @@ class TestErrorScenarios:
             raise RuntimeError("boom")
 
         monkeypatch = pytest.MonkeyPatch()
-        monkeypatch.setattr(shutil, "copytree", boom)
+        monkeypatch.setattr(shutil, "copystat", boom)
         with pytest.raises(RuntimeError):
             workflow.public_workflow(cfg)
         assert not (tmp_path / "public").exists()
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.git_state import collect_git_state
+
+
+def init_repo(path: Path) -> None:
+    subprocess.run(["git", "init", "-b", "main"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "test@example.com"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "Tester"], cwd=path, check=True)
+
+
+def test_collect_git_state(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "overlay").mkdir(parents=True)
+    init_repo(repo)
+    (repo / "a.txt").write_text("1")
+    (repo / "overlay" / "secret.txt").write_text("s")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-m", "init"], cwd=repo, check=True)
+    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True)
+
+    (repo / "a.txt").write_text("2")
+    (repo / "new.txt").write_text("n")
+    (repo / "staged.txt").write_text("s")
+    subprocess.run(["git", "add", "staged.txt"], cwd=repo, check=True)
+
+    state = collect_git_state(repo)
+    assert state.branch == "main"
+    assert state.commit == head.stdout.strip()
+    assert state.has_changes
+    assert sorted(state.dirty_files) == ["new.txt", "staged.txt"]
+    assert sorted(state.tracked_files(repo)) == ["a.txt", "overlay/secret.txt", "staged.txt"]
+    assert state.tracked_files(repo / "overlay") == ["secret.txt"]
+    assert state.is_tracked(repo / "overlay")
+    assert state.is_tracked(repo / "a.txt")
+    assert not state.is_tracked(repo / "new.txt")
+    assert not state.is_tracked(repo / "over")
+
+
+def test_collect_git_state_outside_repo(tmp_path):
+    assert collect_git_state(tmp_path) is None
@@ -0,0 +1,184 @@
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import workflow
+from core.history import HistoryScanner, cat_file_batch
+from scripts.precommit import staged_files
+
+
+def init_repo(path: Path) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "test@example.com"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "Tester"], cwd=path, check=True)
+
+
+def commit(repo: Path, files: dict, message: str = "c") -> None:
+    for name, text in files.items():
+        (repo / name).write_text(text)
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", message], cwd=repo, check=True)
+
+
+def test_cat_file_batch_streams_objects(tmp_path):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    commit(repo, {"a.txt": "hello\n"})
+    oid = subprocess.run(
+        ["git", "rev-parse", "HEAD:a.txt"], cwd=repo, capture_output=True, text=True
+    ).stdout.strip()
+
+    assert list(cat_file_batch(repo, [oid, "0" * 40])) == [(oid, b"hello\n"), ("0" * 40, None)]
+
+
+def test_history_scanner_resumes_from_checkpoint(tmp_path):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    commit(repo, {"a.txt": "clean\n"})
+    commit(repo, {"b.txt": "reach me at dev@company.com\n"})
+    commit(repo, {"b.txt": "removed\n"})
+
+    scanned = []
+
+    def scan(text, label):
+        scanned.append(label.split("@")[0])
+        return [label] if "company.com" in text else []
+
+    state = tmp_path / "state.json"
+    commits, blobs, findings = HistoryScanner(repo, scan, "fp", state).run()
+    assert (commits, blobs) == (3, 3)
+    assert [f.split("@")[0] for f in findings] == ["b.txt"]
+
+    # The leak stays in history: the checkpoint does not move past it and its
+    # cached finding is reported again without reading the blob
+    scanned.clear()
+    commit(repo, {"c.txt": "new\n"})
+    commits, blobs, findings = HistoryScanner(repo, scan, "fp", state).run()
+    assert (commits, blobs, len(findings)) == (4, 1, 1)
+    assert scanned == ["c.txt"]
+
+    # Cached blob findings are reused on a full rescan
+    scanned.clear()
+    commits, blobs, findings = HistoryScanner(repo, scan, "fp", state).run(full=True)
+    assert (commits, blobs, scanned) == (4, 0, [])
+    assert len(findings) == 1
+
+    # Once clean, the checkpoint advances
+    clean = HistoryScanner(repo, lambda text, label: [], "clean", state)
+    assert clean.run()[2] == []
+    assert HistoryScanner(repo, scan, "clean", state).run()[:2] == (0, 0)
+
+    # A different scanner configuration starts from scratch
+    commits, blobs, _ = HistoryScanner(repo, scan, "other", state).run()
+    assert (commits, blobs) == (4, 4)
+
+
+def test_scan_history_cli_reports_profile_values(tmp_path, capsys):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    commit(repo, {"a.txt": "host=db01.internal\n"})
+    profile = tmp_path / "p.yaml"
+    profile.write_text("HOST: db01.internal\n")
+    cfg = tmp_path / "c.yaml"
+    cfg.write_text(f"placeholder_values: '{profile.as_posix()}'\n")
+    args = argparse.Namespace(config=cfg, repo=repo, rev="HEAD", full=False)
+
+    with pytest.raises(SystemExit):
+        workflow._scan_history_cli(args)
+    out = capsys.readouterr().out
+    assert "Profile value HOST -> host=db01.internal" in out
+
+    # The leak is still in history, so it is reported again without rescanning
+    with pytest.raises(SystemExit):
+        workflow._scan_history_cli(args)
+    out = capsys.readouterr().out
+    assert "Profile value HOST -> host=db01.internal" in out
+    assert "Scanned 1 new commit, 0 new blobs" in out
+    assert (repo / ".git" / "workflow-history-scan.json").exists()
+
+
+def test_precommit_scans_staged_content_only(tmp_path, capsys):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    commit(repo, {"old.txt": "fine\n"})
+    (repo / "a.txt").write_text("key owner YourCompany\n")
+    (repo / "b.txt").write_text("token abc123\n")
+    subprocess.run(["git", "add", "a.txt", "b.txt"], cwd=repo, check=True)
+    subprocess.run(["git", "rm", "-q", "old.txt"], cwd=repo, check=True)
+    # The working tree copy is clean; only the staged blob leaks
+    (repo / "b.txt").write_text("clean\n")
+    (repo / "untracked.txt").write_text("token zzz\n")
+    args = argparse.Namespace(config=tmp_path / "missing.yaml", repo=repo)
+
+    with pytest.raises(SystemExit):
+        workflow._precommit_cli(args)
+    out = capsys.readouterr().out.splitlines()
+    assert "a.txt:1: Private keyword \"YourCompany\" -> key owner YourCompany" in out
+    assert "b.txt:1: Token -> token abc123" in out
+    assert not any("untracked" in line for line in out)
+
+    subprocess.run(["git", "add", "b.txt"], cwd=repo, check=True)
+    subprocess.run(["git", "rm", "-q", "--cached", "a.txt"], cwd=repo, check=True)
+    workflow._precommit_cli(args)
+    assert "Checked 1 staged file" in capsys.readouterr().out
+
+
+def test_hook_import_path_stays_light(tmp_path):
+    root = Path(__file__).resolve().parents[2]
+    code = (
+        f"import sys; sys.path.insert(0, {str(root)!r}); import scripts.precommit, workflow; "
+        "print(sorted(m for m in ('core.rollback', 'core.validation', 'urllib.request') "
+        "if m in sys.modules))"
+    )
+    code_hook = code.replace(", workflow", "")
+    out = subprocess.run([sys.executable, "-c", code_hook], cwd=tmp_path, capture_output=True, text=True)
+    assert out.stdout.strip() == "[]"
+    # Importing workflow no longer creates a rollback store in the repository
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True, capture_output=True)
+    assert not (tmp_path / ".workflow-rollbacks").exists()
+
+
+def test_precommit_scans_paths_with_newlines_and_renames(tmp_path, capsys):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    commit(repo, {"old.txt": "fine\n"})
+    (repo / "odd\nname.txt").write_text("token abc123\n")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "mv", "old.txt", "moved.txt"], cwd=repo, check=True)
+
+    staged = dict(staged_files(repo))
+    assert staged == {"odd\nname.txt": b"token abc123\n", "moved.txt": b"fine\n"}
+    with pytest.raises(SystemExit):
+        workflow._precommit_cli(argparse.Namespace(config=tmp_path / "missing.yaml", repo=repo))
+    assert "odd\nname.txt:1: Token -> token abc123" in capsys.readouterr().out
+
+
+def test_hook_reads_profile_without_side_effects(tmp_path, monkeypatch, capsys):
+    repo = tmp_path / "repo"
+    init_repo(repo)
+    profile = tmp_path / "p.yaml"
+    text = "HOST: db01.internal\nSITE: '{{ SITE }}'\nOWNER: TODO\n"
+    profile.write_text(text)
+    cfg = tmp_path / "c.yaml"
+    cfg.write_text(f"placeholder_values: '{profile.as_posix()}'\n")
+    (repo / "a.txt").write_text("host=db01.internal\n")
+    subprocess.run(["git", "add", "a.txt"], cwd=repo, check=True)
+    monkeypatch.setenv("CONVERSION_AUTO_FIX", "1")
+
+    with pytest.raises(SystemExit):
+        workflow._precommit_cli(argparse.Namespace(config=cfg, repo=repo))
+    out = capsys.readouterr().out
+    assert out.splitlines()[0] == "a.txt:1: Profile value HOST -> host=db01.internal"
+    assert "⚠️" not in out
+    assert profile.read_text() == text
+
+    # A malformed profile is a clean error, not a traceback
+    profile.write_text("- just\n- a list\n")
+    with pytest.raises(SystemExit, match="must contain a mapping"):
+        workflow._precommit_cli(argparse.Namespace(config=cfg, repo=repo))
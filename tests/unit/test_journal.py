@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import workflow
+from core.journal import WriteJournal
+from scripts import apply_template_context
+
+
+def test_rollback_restores_prior_state(tmp_path):
+    existing = tmp_path / "existing.txt"
+    existing.write_text("old")
+    journal = WriteJournal(tmp_path / "run.journal")
+
+    journal.write_text(existing, "new")
+    journal.write_text(tmp_path / "created.txt", "x")
+    journal.create_dir(tmp_path / "out")
+    (tmp_path / "out").mkdir()
+    journal.write_text(tmp_path / "out" / "inner.txt", "y")
+    assert existing.read_text() == "new"
+
+    assert journal.rollback() == 3
+    assert existing.read_text() == "old"
+    assert not (tmp_path / "created.txt").exists()
+    assert not (tmp_path / "out").exists()
+    assert not (tmp_path / "run.journal").exists()
+
+
+def test_commit_keeps_writes(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("old")
+    journal = WriteJournal(tmp_path / "run.journal")
+    journal.write_text(target, "new")
+    journal.commit()
+
+    assert target.read_text() == "new"
+    assert WriteJournal.recover(tmp_path / "run.journal") == 0
+    assert not (tmp_path / "run.journal.d").exists()
+
+
+def test_recover_interrupted_run(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("old")
+    journal = WriteJournal(tmp_path / "run.journal")
+    journal.write_text(target, "half")
+    with (tmp_path / "run.journal").open("a") as f:
+        f.write('{"path": "torn')
+
+    # A later process finds the journal left behind and undoes it
+    assert WriteJournal.recover(tmp_path / "run.journal") == 1
+    assert target.read_text() == "old"
+
+
+def test_private_workflow_undone_from_journal(tmp_path, monkeypatch):
+    cfg = tmp_path / "c.yaml"
+    placeholder_values = tmp_path / "p.yaml"
+    template_source_dir = tmp_path / "template"
+    working_directory = tmp_path / "work"
+    template_source_dir.mkdir()
+    (template_source_dir / "a.txt").write_text("x={{X}}")
+    placeholder_values.write_text("X: 1")
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+        "rollback:\n  snapshot: false\n"
+    )
+
+    def boom(*a, **k):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(apply_template_context, "replace_tokens", boom)
+    with pytest.raises(RuntimeError):
+        workflow.private_workflow(cfg)
+
+    assert not (working_directory / "private").exists()
+    assert not (working_directory / ".private.journal").exists()
+    assert not (tmp_path / ".workflow-rollbacks" / "index.jsonl").exists()
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.constants import KEYWORDS
+from core.keywords import KeywordMatcher, keyword_matcher
+from scripts.export_to_public import should_filter_line
+
+
+def test_matcher_reports_keywords_in_order():
+    matcher = KeywordMatcher(["internal", "intern", "Acme"])
+    text = "ACME interns\n"
+    assert matcher.search(text)
+    assert matcher.find(text) == ["intern", "Acme"]
+    assert matcher.first(text) == "intern"
+    assert not matcher.search("public text")
+    assert matcher.first("public text") is None
+    assert not KeywordMatcher([]).search("anything")
+
+
+def test_config_keywords_reach_export_filter():
+    line = "see project Falcon notes"
+    assert not should_filter_line(line)
+    matcher = keyword_matcher({"keywords": ["falcon"]})
+    assert should_filter_line(line, matcher)
+    assert matcher.keywords == [*KEYWORDS, "falcon"]
+    assert keyword_matcher() is keyword_matcher({})
+
+
+def test_clis_read_keywords_from_config(tmp_path):
+    scripts = Path(__file__).resolve().parents[2] / "scripts"
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "notes.md").write_text("keep\nproject Falcon notes\n")
+    (tmp_path / ".workflow-config.yaml").write_text("keywords:\n  - falcon\n")
+
+    def run(script, *args):
+        return subprocess.run(
+            [sys.executable, str(scripts / script), *args],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+        )
+
+    assert run("export_to_public.py", "src", "out").returncode == 0
+    assert (tmp_path / "out" / "notes.md").read_text() == "keep\n"
+    result = run("verify_public_export.py", "src", "out")
+    assert result.returncode == 0
+    assert "notes.md has cleaned lines" in result.stdout
+
+    # Without the config the dropped line is a mismatch
+    (tmp_path / ".workflow-config.yaml").unlink()
+    assert run("verify_public_export.py", "src", "out").returncode == 1
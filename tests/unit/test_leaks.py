@@ -0,0 +1,87 @@
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import workflow
+from core.keywords import trie_regex
+from core.leaks import ProfileLeakScanner
+
+
+def test_trie_regex_prefers_longest_value():
+    pattern = re.compile(trie_regex(["db01.internal", "db01.internal.acme", "dbx"]))
+    assert [m.group(0) for m in pattern.finditer("db01.internal.acme db01.internal dbx")] == [
+        "db01.internal.acme",
+        "db01.internal",
+        "dbx",
+    ]
+
+
+def test_scanner_finds_values_and_variants(tmp_path):
+    scanner = ProfileLeakScanner(
+        {"ORG": "Acme Widgets", "HOST": "db01.internal", "SHORT": "ab", "PORT": 5432}
+    )
+    text = "x\nAcme_Widgets client\nconnect DB01.INTERNAL\nacme-widgets and ab 5432\n"
+    assert [(lineno, key) for lineno, key, _ in scanner.scan_text(text)] == [
+        (2, "ORG"),
+        (3, "HOST"),
+        (4, "ORG"),
+    ]
+
+    (tmp_path / "a.txt").write_text(text)
+    (tmp_path / "b.bin").write_bytes(b"\x00Acme Widgets")
+    assert not scanner.scan_directory(tmp_path)
+
+
+def test_empty_profile_scans_nothing(tmp_path):
+    (tmp_path / "a.txt").write_text("anything")
+    assert ProfileLeakScanner({}).scan_directory(tmp_path)
+
+
+def test_public_workflow_reports_profile_values(tmp_path, monkeypatch, capsys):
+    cfg = tmp_path / 'c.yaml'
+    placeholder_values = tmp_path / 'p.yaml'
+    template_source_dir = tmp_path / 'template'
+    working_directory = tmp_path / 'work'
+    template_source_dir.mkdir()
+    (template_source_dir / 'a.txt').write_text('host={{HOST}}\nfallback=db01.internal\n')
+    placeholder_values.write_text('HOST: db01.internal\n')
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+    )
+    monkeypatch.setattr(workflow, 'verify_public_export', lambda *a, **k: True)
+
+    workflow.public_workflow(cfg)
+
+    assert 'a.txt:2: Profile value HOST -> fallback=db01.internal' in capsys.readouterr().out
+
+
+def test_unset_values_and_partial_words_are_ignored():
+    scanner = ProfileLeakScanner(
+        {"OWNER": "TODO", "TEAM": "FIXME", "SITE": "{{ SITE }}", "ORG": "Acme"}
+    )
+    text = "# TODO: refactor\n# fixme later\nAcmeville {{ SITE }}\nby acme.\n"
+    assert [(lineno, key) for lineno, key, _ in scanner.scan_text(text)] == [(4, "ORG")]
+
+
+def test_identifier_forms_match_inside_identifiers(tmp_path):
+    from scripts.apply_template_context import replace_tokens
+
+    scanner = ProfileLeakScanner({"ORG": "Acme Corp", "DB": "prod-db-host"})
+    text = "ACME_CORP_URL = 1\nAcmeCorp_client()\nprod_db_host_name\nacmecorporate\n"
+    assert [(lineno, key) for lineno, key, _ in scanner.scan_text(text)] == [
+        (1, "ORG"),
+        (2, "ORG"),
+        (3, "DB"),
+    ]
+
+    (tmp_path / "client.py").write_text("class {{ ORG }}Client:\n    pass\n")
+    replace_tokens(tmp_path, {"ORG": "ACME Corp"}, tmp_path / "render.log", False)
+    rendered = (tmp_path / "client.py").read_text()
+    assert rendered.startswith("class ACME_CorpClient:")
+    assert scanner.report(rendered, "client.py") == [
+        "client.py:1: Profile value ORG -> class ACME_CorpClient:"
+    ]
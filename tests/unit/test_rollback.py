@@ -1,7 +1,10 @@
+import json
 import subprocess
 from pathlib import Path
 
 import sys
+import pytest
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from core.rollback import RollbackManager
@@ -94,3 +97,370 @@ def test_corrupted_snapshot_handling(tmp_path):
 
     assert not rm.verify_snapshot(snap)
     assert not rm.rollback_to(snap)
+
+
+def test_snapshots_share_blobs(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    commit_file(repo, "b.txt", "1", "same content")
+
+    rm = RollbackManager(repo)
+    snap1 = rm.create_snapshot("one")
+    snap2 = rm.create_snapshot("two")
+
+    blobs = [p for p in (repo / ".workflow-rollbacks" / "objects").rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+    assert not (repo / ".workflow-rollbacks" / snap2 / "files").exists()
+    assert rm.verify_snapshot(snap1) and rm.verify_snapshot(snap2)
+
+
+def test_cleanup_collects_unreferenced_blobs(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    rm = RollbackManager(repo, max_history=1)
+    rm.create_snapshot("one")
+    commit_file(repo, "a.txt", "2", "change")
+    snap = rm.create_snapshot("two")
+
+    blobs = [p for p in (repo / ".workflow-rollbacks" / "objects").rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+    (repo / "a.txt").write_text("3")
+    rm.rollback_to(snap)
+    assert (repo / "a.txt").read_text() == "2"
+
+
+def test_git_backend_records_tree(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    (repo / "a.txt").write_text("dirty")
+
+    rm = RollbackManager(repo, backend="git")
+    snap = rm.create_snapshot("op")
+
+    meta = json.loads((repo / ".workflow-rollbacks" / snap / "metadata.json").read_text())
+    assert meta["backend"] == "git"
+    assert meta["tree"]
+    assert not (repo / ".workflow-rollbacks" / "objects").exists()
+    # The real index must not pick up the dirty file
+    staged = subprocess.run(["git", "diff", "--cached", "--name-only"], cwd=repo, capture_output=True, text=True)
+    assert staged.stdout == ""
+
+    (repo / "a.txt").write_text("oops")
+    assert rm.rollback_to(snap)
+    assert (repo / "a.txt").read_text() == "dirty"
+
+
+def test_unknown_backend_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RollbackManager(tmp_path, backend="tape")
+
+
+def test_rollback_restores_only_changed_files(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    commit_file(repo, "b.txt", "1", "second")
+
+    rm = RollbackManager(repo)
+    (repo / "a.txt").write_text("dirty")
+    snap = rm.create_snapshot("op")
+    (repo / "a.txt").write_text("broken render")
+
+    restored = []
+    original = rm._restore_blob
+
+    def spy(entry, dst):
+        restored.append(dst.name)
+        original(entry, dst)
+
+    monkeypatch.setattr(rm, "_restore_blob", spy)
+    assert rm.rollback_to(snap)
+    assert restored == ["a.txt"]
+    assert (repo / "a.txt").read_text() == "dirty"
+
+
+def test_snapshot_index_answers_listing(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    rm = RollbackManager(repo, max_history=2)
+    rm.create_snapshot("one")
+    snap2 = rm.create_snapshot("two")
+    snap3 = rm.create_snapshot("three")
+
+    # Listing must not open the per-snapshot directories
+    monkeypatch.setattr(Path, "glob", lambda *a, **k: iter(()))
+    snaps = rm.list_snapshots()
+    assert [s["timestamp"] for s in snaps] == [snap3, snap2]
+    assert rm.get_snapshot(1)["operation"] == "two"
+    assert rm.get_snapshot(2) is None
+
+
+def test_snapshot_index_rebuilt_for_existing_storage(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    rm = RollbackManager(repo)
+    snap = rm.create_snapshot("op")
+    (repo / ".workflow-rollbacks" / "index.jsonl").unlink()
+
+    assert [s["timestamp"] for s in rm.list_snapshots()] == [snap]
+    assert (repo / ".workflow-rollbacks" / "index.jsonl").exists()
+
+
+def test_scoped_snapshot_limits_to_write_set(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    out = repo / "work" / "public"
+    out.mkdir(parents=True)
+    (out / "keep.txt").write_text("old")
+
+    rm = RollbackManager(repo)
+    snap = rm.create_snapshot("op", paths=[out, repo / "work" / "private"])
+    manifest = json.loads((repo / ".workflow-rollbacks" / snap / "manifest.json").read_text())
+    assert list(manifest) == ["work/public/keep.txt"]
+
+    (repo / "a.txt").write_text("untouched by rollback")
+    (out / "keep.txt").write_text("new")
+    (out / "sub").mkdir()
+    (out / "sub" / "added.txt").write_text("x")
+    (repo / "work" / "private").mkdir()
+    assert rm.rollback_to(snap)
+
+    assert (out / "keep.txt").read_text() == "old"
+    assert not (out / "sub").exists()
+    assert not (repo / "work" / "private").exists()
+    assert (repo / "a.txt").read_text() == "untouched by rollback"
+
+
+@pytest.mark.parametrize("compression", ["xz", "gz"])
+def test_archive_backend_round_trip(tmp_path, compression):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    (repo / "a.txt").write_text("dirty")
+
+    rm = RollbackManager(repo, backend="archive", compression=compression, compression_level=1)
+    snap = rm.create_snapshot("op")
+
+    snap_dir = repo / ".workflow-rollbacks" / snap
+    assert (snap_dir / f"files.tar.{compression}").is_file()
+    assert rm.verify_snapshot(snap)
+
+    (repo / "a.txt").write_text("oops")
+    assert rm.rollback_to(snap)
+    assert (repo / "a.txt").read_text() == "dirty"
+
+
+def test_truncated_archive_fails_verification(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    rm = RollbackManager(repo, backend="archive")
+    snap = rm.create_snapshot("op")
+    (repo / ".workflow-rollbacks" / snap / "files.tar.xz").write_bytes(b"\xfd7zXZ")
+
+    assert not rm.verify_snapshot(snap)
+
+
+def test_archive_tolerates_file_growing_while_read(tmp_path, monkeypatch):
+    import core.rollback as rollback
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    real_fstat = rollback.os.fstat
+
+    def growing_fstat(fd):
+        st = real_fstat(fd)
+        with (repo / "a.txt").open("a") as f:
+            f.write("grown")
+        return st
+
+    monkeypatch.setattr(rollback.os, "fstat", growing_fstat)
+    rm = RollbackManager(repo, backend="archive")
+    snap = rm.create_snapshot("op")
+    monkeypatch.undo()
+
+    assert rm.verify_snapshot(snap)
+    assert rm.verify_contents(snap) == []
+    (repo / "a.txt").write_text("oops")
+    assert rm.rollback_to(snap)
+    assert (repo / "a.txt").read_text() == "1grown"
+
+
+def test_failed_archive_is_not_recorded(tmp_path, monkeypatch):
+    import tarfile
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    def broken_addfile(self, tarinfo, fileobj=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tarfile.TarFile, "addfile", broken_addfile)
+    rm = RollbackManager(repo, backend="archive")
+    with pytest.raises(OSError):
+        rm.create_snapshot("op")
+
+    assert rm.list_snapshots() == []
+    assert not list((repo / ".workflow-rollbacks").glob("*/files.tar.xz"))
+
+
+@pytest.mark.parametrize("backend", ["blobs", "archive", "git"])
+def test_verify_contents_clean_snapshot(tmp_path, backend):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    commit_file(repo, "b.txt", "2", "second")
+
+    rm = RollbackManager(repo, backend=backend)
+    snap = rm.create_snapshot("op")
+    assert rm.verify_contents(snap, workers=2) == []
+
+
+def test_verify_contents_reports_corrupted_blob(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    commit_file(repo, "b.txt", "2", "second")
+
+    rm = RollbackManager(repo)
+    snap = rm.create_snapshot("op")
+    manifest = json.loads((repo / ".workflow-rollbacks" / snap / "manifest.json").read_text())
+    rm._blob_path(manifest["b.txt"]["hash"]).write_text("")
+
+    assert rm.verify_contents(snap) == ["b.txt"]
+
+
+def test_verify_contents_rehashes_git_objects(tmp_path):
+    import zlib
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    commit_file(repo, "b.txt", "2", "second")
+
+    rm = RollbackManager(repo, backend="git")
+    snap = rm.create_snapshot("op")
+    manifest = json.loads((repo / ".workflow-rollbacks" / snap / "manifest.json").read_text())
+    oid = manifest["b.txt"]["hash"]
+    # A well-formed object with the wrong contents still exists to --batch-check
+    loose = repo / ".git" / "objects" / oid[:2] / oid[2:]
+    loose.chmod(0o644)
+    loose.write_bytes(zlib.compress(b"blob 1\0X"))
+
+    assert rm.verify_contents(snap) == ["b.txt"]
+
+
+def test_retention_by_bytes_and_age(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "x" * 100, "init")
+
+    rm = RollbackManager(repo, max_history=10, max_bytes=250)
+    rm.create_snapshot("one")
+    rm.create_snapshot("two")
+    rm.create_snapshot("three")
+    assert [s["operation"] for s in rm.list_snapshots()] == ["three", "two"]
+
+    rm.max_bytes = None
+    rm.max_age_days = 1
+    old = rm.list_snapshots()[-1]
+    old["timestamp"] = "20000101T000000000000Z"
+    assert rm._expired_snapshots([old, rm.list_snapshots()[0]]) == [old]
+
+
+def test_background_gc_is_incremental(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+
+    rm = RollbackManager(repo, max_history=1, background_gc=True)
+    rm.create_snapshot("one")
+    commit_file(repo, "a.txt", "2", "change")
+    rm.create_snapshot("two")
+    rm._gc_thread.join()
+
+    assert [s["operation"] for s in rm.list_snapshots()] == ["two"]
+    snaps = list((repo / ".workflow-rollbacks").glob("*/metadata.json"))
+    assert len(snaps) == 1
+
+    (repo / ".workflow-rollbacks" / "20000101T000000000000Z").mkdir()
+    (repo / ".workflow-rollbacks" / "20000102T000000000000Z").mkdir()
+    assert rm.collect_garbage(limit=1) == 1
+    assert rm.collect_garbage() == 1
+    assert rm.collect_garbage() == 0
+
+
+def test_gc_waits_for_snapshot_in_another_process(tmp_path):
+    import sys
+    import threading
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    init_repo(repo)
+    commit_file(repo, "a.txt", "1", "init")
+    rm = RollbackManager(repo)
+    rm.create_snapshot("op")
+
+    # Another process is writing a snapshot it has not indexed yet
+    root = Path(__file__).resolve().parents[2]
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"import sys; sys.path.insert(0, {str(root)!r})\n"
+            "from pathlib import Path\n"
+            "from core.rollback import RollbackManager\n"
+            "rm = RollbackManager(Path('.'))\n"
+            "with rm._lock:\n"
+            "    Path('.workflow-rollbacks/20990101T000000000000Z').mkdir()\n"
+            "    print('locked', flush=True)\n"
+            "    sys.stdin.read()\n",
+        ],
+        cwd=repo,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert holder.stdout.readline() == "locked\n"
+    in_flight = repo / ".workflow-rollbacks" / "20990101T000000000000Z"
+
+    gc = threading.Thread(target=rm.collect_garbage)
+    gc.start()
+    gc.join(0.5)
+    assert gc.is_alive()
+    assert in_flight.is_dir()
+
+    holder.stdin.close()
+    holder.wait()
+    gc.join(10)
+    assert not gc.is_alive()
+    # Never indexed, so it is collected once the writer is gone
+    assert not in_flight.exists()
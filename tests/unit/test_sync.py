@@ -0,0 +1,132 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import workflow
+import core.sync
+from core.sync import ExportManifest, sync_tree
+
+
+def test_sync_tree_links_unchanged_files(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "same.txt").write_text("same")
+    (src / "sub" / "edit.txt").write_text("v1")
+    (src / "gone.txt").write_text("bye")
+    (src / "link").symlink_to("same.txt")
+
+    first = tmp_path / "first"
+    assert sorted(sync_tree(src, None, first)) == sorted(
+        [Path("same.txt"), Path("sub/edit.txt"), Path("gone.txt"), Path("link")]
+    )
+
+    (src / "sub" / "edit.txt").write_text("v2")
+    (src / "gone.txt").unlink()
+    (src / "new.txt").write_text("new")
+    # Same content with a new mtime is still unchanged
+    os.utime(src / "same.txt", ns=(0, 0))
+
+    second = tmp_path / "second"
+    changed = sync_tree(src, first, second)
+
+    assert sorted(changed) == [Path("new.txt"), Path("sub/edit.txt")]
+    assert (second / "same.txt").stat().st_ino == (first / "same.txt").stat().st_ino
+    assert (second / "sub" / "edit.txt").read_text() == "v2"
+    assert not (second / "gone.txt").exists()
+    assert os.readlink(second / "link") == "same.txt"
+    assert (first / "sub" / "edit.txt").read_text() == "v1"
+
+
+def test_public_workflow_keeps_mtime_of_unchanged_files(tmp_path, monkeypatch):
+    cfg = tmp_path / "c.yaml"
+    placeholder_values = tmp_path / "p.yaml"
+    template_source_dir = tmp_path / "template"
+    working_directory = tmp_path / "work"
+    template_source_dir.mkdir()
+    (template_source_dir / "a.txt").write_text("a")
+    (template_source_dir / "b.txt").write_text("b1")
+    placeholder_values.write_text("X: 1")
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+    )
+    monkeypatch.setattr(workflow, "verify_public_export", lambda *a, **k: True)
+
+    os.utime(template_source_dir / "a.txt", ns=(1, 1))
+    public_dir = workflow.public_workflow(cfg)
+    inode = (public_dir / "a.txt").stat().st_ino
+    (template_source_dir / "b.txt").write_text("b2")
+    workflow.public_workflow(cfg)
+
+    assert (public_dir / "a.txt").stat().st_mtime_ns == 1
+    assert (public_dir / "a.txt").stat().st_ino == inode
+    assert (public_dir / "b.txt").read_text() == "b2"
+
+
+def test_export_written_in_place_is_not_linked_or_restored(tmp_path, monkeypatch):
+    cfg = tmp_path / "c.yaml"
+    placeholder_values = tmp_path / "p.yaml"
+    template_source_dir = tmp_path / "template"
+    working_directory = tmp_path / "work"
+    template_source_dir.mkdir()
+    (template_source_dir / "a.txt").write_text("a")
+    placeholder_values.write_text("X: 1")
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+    )
+    monkeypatch.setattr(workflow, "verify_public_export", lambda *a, **k: True)
+
+    public_dir = workflow.public_workflow(cfg)
+    workflow.public_workflow(cfg)
+    prev = working_directory / "public.prev"
+    assert (public_dir / "a.txt").stat().st_ino == (prev / "a.txt").stat().st_ino
+
+    # Editing the export in place also edits the linked previous export
+    with (public_dir / "a.txt").open("a") as f:
+        f.write("!")
+    assert (prev / "a.txt").read_text() == "a!"
+    with pytest.raises(SystemExit):
+        workflow._restore_previous_public(public_dir)
+    assert (public_dir / "a.txt").read_text() == "a!"
+
+    # The next export copies the edited file from the template instead of linking it
+    workflow.public_workflow(cfg)
+    assert (public_dir / "a.txt").read_text() == "a"
+    assert (public_dir / "a.txt").stat().st_ino != (prev / "a.txt").stat().st_ino
+
+
+def test_sync_tree_records_manifest(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("a")
+    (src / "b.txt").write_text("b1")
+    (src / "link").symlink_to("a.txt")
+
+    first = tmp_path / "first"
+    manifest = ExportManifest()
+    sync_tree(src, None, first, manifest)
+    assert sorted(manifest.files) == ["a.txt", "b.txt"]
+    assert manifest.links == {"link": "a.txt"}
+    assert all(manifest.matches(first, rel) for rel in manifest.paths())
+
+    (src / "b.txt").write_text("b two")
+    hashed = []
+    original = core.sync.sha256_file
+    monkeypatch.setattr(core.sync, "sha256_file", lambda p: hashed.append(p.name) or original(p))
+
+    second = tmp_path / "second"
+    again = ExportManifest()
+    sync_tree(src, first, second, again, manifest)
+
+    # a.txt keeps its hash from the previous manifest; b.txt is hashed while copied
+    assert hashed == []
+    assert again.files["a.txt"] == manifest.files["a.txt"]
+    assert again.matches(second, Path("b.txt"))
+    assert not manifest.matches(second, Path("b.txt"))
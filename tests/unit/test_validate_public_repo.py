@@ -1,8 +1,16 @@
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
-from scripts.validate_public_repo import validate_directory
+import scripts.validate_public_repo as validate_public_repo
+from scripts.validate_public_repo import (
+    MAX_LINE_LENGTH,
+    match_line,
+    scan_file,
+    scan_text,
+    validate_directory,
+)
 
 
 def test_validate_directory_passes(tmp_path):
@@ -24,3 +32,100 @@ def test_validate_directory_detects_keys(tmp_path):
     base.mkdir()
     (base / "key.txt").write_text("ssh-rsa AAAAB3Nza...\n")
     assert not validate_directory(base)
+
+
+def test_scan_file_reports_every_matching_pattern(tmp_path, capsys):
+    path = tmp_path / "a.txt"
+    path.write_text("clean\nmail me@company.com\nPASSWORD: hunter2\n")
+    assert not scan_file(path)
+    out = capsys.readouterr().out.splitlines()
+    assert out == [
+        f"{path}:2: Company reference -> mail me@company.com",
+        f"{path}:2: Email -> mail me@company.com",
+        f"{path}:3: Token -> PASSWORD: hunter2",
+    ]
+
+
+def test_match_line_literal_prefilter_respects_case_folding():
+    # IGNORECASE lets the long s match "s"; the prefilter must not drop it
+    assert match_line("ſsh-rsa AAAA") == ["Token"]
+    assert match_line("nothing to see here") == []
+
+
+def _export_with_findings(base):
+    base.mkdir()
+    for i in range(40):
+        (base / f"f{i:02d}.txt").write_text("clean line\n")
+    (base / "f07.txt").write_text("ip 10.0.0.1\n")
+    (base / "f31.txt").write_text("token abc\n")
+
+
+def test_parallel_scan_matches_serial_order(tmp_path, capsys):
+    base = tmp_path / "public"
+    _export_with_findings(base)
+
+    assert not validate_directory(base)
+    serial = capsys.readouterr().out
+    assert not validate_directory(base, workers=2, chunk_size=4)
+    parallel = capsys.readouterr().out
+
+    assert parallel == serial
+    assert serial.index("f07.txt") < serial.index("f31.txt")
+
+
+def test_fail_fast_stops_at_first_finding(tmp_path, capsys):
+    base = tmp_path / "public"
+    _export_with_findings(base)
+    for path in base.iterdir():
+        os.utime(path, (1000, 1000))
+    # The most recently modified file is scanned first
+    os.utime(base / "f31.txt", (2000, 2000))
+
+    expected = [f"{base / 'f31.txt'}:1: Token -> token abc"]
+    assert not validate_directory(base, fail_fast=True)
+    assert capsys.readouterr().out.splitlines() == expected
+    assert not validate_directory(base, workers=2, chunk_size=4, fail_fast=True)
+    assert capsys.readouterr().out.splitlines() == expected
+
+
+def test_overlong_lines_are_scanned_in_windows():
+    # Straddles the first window boundary
+    line = "x" * (MAX_LINE_LENGTH - 5) + " 10.0.0.1 " + "y" * MAX_LINE_LENGTH
+    assert match_line(line) == ["IP address"]
+    report = scan_text(line, "min.js")
+    assert report == [f"min.js:1: IP address -> {'x' * 200}..."]
+
+
+def test_pathological_email_line_is_fast():
+    # Quadratic for a plain search of EMAIL_PATTERN
+    text = "a" * 200_000 + "@\nmail x@y\n"
+    assert scan_text(text, "lock") == ["lock:2: Email -> mail x@y"]
+
+
+def test_slow_file_is_abandoned_and_reported(monkeypatch):
+    clock = iter([0.0, 0.1, 0.5, 2.0])
+    monkeypatch.setattr(validate_public_repo.time, "monotonic", lambda: next(clock))
+    text = "token one\ntoken two\ntoken three\n"
+    assert scan_text(text, "f", budget=1.0) == [
+        "f:1: Token -> token one",
+        "f:2: Scan abandoned after 1s",
+    ]
+
+
+def test_multi_megabyte_line_is_searched_in_windows_within_budget(monkeypatch):
+    searched = []
+
+    class Spy:
+        def search(self, text):
+            searched.append(len(text))
+            return None
+
+    ticks = iter(range(100))
+    monkeypatch.setattr(validate_public_repo.time, "monotonic", lambda: float(next(ticks)))
+    monkeypatch.setattr(validate_public_repo, "_CHECKS", [((Spy(), "Spy"), ("x",))])
+    text = "x" * 4_000_000
+
+    assert scan_text(text, "f", budget=3.0) == ["f:1: Scan abandoned after 3s"]
+    # The candidate pass stops at the deadline instead of searching all 4 MB
+    assert len(searched) == 3
+    assert max(searched) == 2 * MAX_LINE_LENGTH
@@ -0,0 +1,138 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.validation import (
+    IdentifierCheck,
+    PlaceholderCheck,
+    PrivateReferenceCheck,
+    ValidationCache,
+    ValidationEngine,
+)
+import workflow
+
+
+def test_engine_reads_each_file_once(tmp_path, monkeypatch):
+    template = tmp_path / "template"
+    (template / "pkg").mkdir(parents=True)
+    (template / "pkg" / "mod.py").write_text("class {{ NAME }}Client:\n    pass\n")
+    (template / "notes.txt").write_text("{{NAME}} at YourCompany\n")
+
+    reads = []
+    original = Path.read_bytes
+
+    def counting(self):
+        reads.append(self.name)
+        return original(self)
+
+    monkeypatch.setattr(Path, "read_bytes", counting)
+
+    placeholders = PlaceholderCheck()
+    identifiers = IdentifierCheck({"NAME": "Acme Corp"})
+    private = PrivateReferenceCheck()
+    ValidationEngine([placeholders, identifiers, private]).run(template)
+
+    assert sorted(reads) == ["mod.py", "notes.txt"]
+    assert placeholders.placeholders == {"NAME"}
+    assert len(placeholders.styles) == 2
+    assert identifiers.errors == []
+    assert "contains spaces: 'Acme Corp'" in identifiers.warnings[0]
+    assert private.hits == {
+        str(template / "notes.txt"): [(1, "{{NAME}} at YourCompany", "YourCompany")]
+    }
+
+
+def test_private_reference_check_skips_binary_and_limits_hits(tmp_path):
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG YourCompany")
+    (tmp_path / "a.txt").write_text("x@company.com\n" * 5)
+
+    check = PrivateReferenceCheck(limit=3)
+    ValidationEngine([check]).run(tmp_path)
+
+    assert list(check.hits) == [str(tmp_path / "a.txt")]
+    assert [idx for idx, _, _ in check.hits[str(tmp_path / "a.txt")]] == [1, 2, 3]
+
+
+def test_engine_fail_fast_checks_newest_file_first(tmp_path):
+    for i in range(5):
+        (tmp_path / f"f{i}.txt").write_text("YourCompany\n")
+        os.utime(tmp_path / f"f{i}.txt", (1000 + i, 1000 + i))
+
+    check = PrivateReferenceCheck()
+    ValidationEngine([check]).run(tmp_path, fail_fast=True)
+
+    assert list(check.hits) == [str(tmp_path / "f4.txt")]
+
+
+def _run(template, cache_path, profile):
+    checks = [PlaceholderCheck(), IdentifierCheck(profile), PrivateReferenceCheck()]
+    cache = ValidationCache(cache_path, max_entries=10)
+    ValidationEngine(checks).run(template, cache)
+    cache.save()
+    return checks, cache
+
+
+def test_cache_reuses_findings_for_unchanged_files(tmp_path, monkeypatch):
+    template = tmp_path / "template"
+    template.mkdir()
+    (template / "a.py").write_text("def {{ NAME }}_run():\n    pass\n")
+    (template / "b.txt").write_text("YourCompany {{OTHER}}\n")
+    cache_path = tmp_path / "cache.json"
+
+    cold, _ = _run(template, cache_path, {"NAME": "a b"})
+
+    reads = []
+    original = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda self: reads.append(self.name) or original(self))
+    (template / "b.txt").write_text("YourCompany {{OTHER}} {{NEW}}\n")
+    warm, cache = _run(template, cache_path, {"NAME": "a b"})
+
+    assert reads == ["b.txt"]
+    assert cache.hits == 1
+    assert warm[1].warnings == cold[1].warnings
+    assert warm[2].hits[str(template / "b.txt")][0][1] == "YourCompany {{OTHER}} {{NEW}}"
+    assert warm[0].placeholders == {"NAME", "OTHER", "NEW"}
+
+    # A different profile invalidates the cached findings
+    reads.clear()
+    changed, _ = _run(template, cache_path, {"NAME": "bad-value"})
+    assert sorted(reads) == ["a.py", "b.txt"]
+    assert "invalid identifier value" in changed[1].errors[0]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ValidationCache(tmp_path / "cache.json", max_entries=2)
+    st = (tmp_path).stat()
+    for key in ("a", "b"):
+        cache.put(tmp_path / key, st, key, key, {})
+    assert cache.get("a") == {}
+    cache.put(tmp_path / "c", st, "c", "c", {})
+    cache.save()
+
+    reloaded = ValidationCache(tmp_path / "cache.json", max_entries=2)
+    assert list(reloaded.entries) == ["a", "c"]
+    assert list(reloaded.stats) == [str(tmp_path / "b"), str(tmp_path / "c")]
+
+
+def test_validate_before_workflow_cache_matches_uncached(tmp_path):
+    template = tmp_path / "template"
+    template.mkdir()
+    (template / "a.txt").write_text("{{X}} {{lower}} YourCompany\n")
+    placeholder_values = tmp_path / "p.yaml"
+    placeholder_values.write_text("X: 1\n")
+    work = tmp_path / "work"
+    cfg = tmp_path / "c.yaml"
+    cfg.write_text(
+        f"placeholder_values: '{placeholder_values.as_posix()}'\n"
+        f"template_source_dir: '{template.as_posix()}'\n"
+        f"working_directory: '{work.as_posix()}'\n"
+    )
+
+    plain = workflow.validate_before_workflow(cfg, "private")
+    cold = workflow.validate_before_workflow(cfg, "private", use_cache=True)
+    warm = workflow.validate_before_workflow(cfg, "private", use_cache=True)
+
+    assert (work / workflow.VALIDATION_CACHE).exists()
+    assert plain == cold == warm
@@ -1,11 +1,13 @@
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from scripts.verify_public_export import verify_public_export
+from scripts.verify_public_export import _compare_files, verify_public_export
 from scripts.export_to_public import export_directory
 from core.constants import KEYWORDS
+from core.sync import ExportManifest, sync_tree
 
 
 def test_verify_export_simple(tmp_path):
@@ -46,3 +48,57 @@ def test_verify_export_cleaned_lines(tmp_path):
     (template / "readme.md").write_text("ok\n" + line + "end\n")
     export_directory(template, export)
     assert verify_public_export(template, export)
+
+
+def test_verify_export_fail_fast_stops_at_newest_mismatch(tmp_path, capsys):
+    template = tmp_path / "template"
+    export = tmp_path / "export"
+    template.mkdir()
+    export.mkdir()
+    for i in range(3):
+        (template / f"{i}.txt").write_text("hello\n")
+        (export / f"{i}.txt").write_text("oops\n")
+        os.utime(export / f"{i}.txt", (1000 - i, 1000 - i))
+
+    assert not verify_public_export(template, export, fail_fast=True)
+    assert capsys.readouterr().out.splitlines() == ["\u2717 Error: 0.txt content mismatch"]
+
+
+def test_compare_files_decodes_only_differing_text(tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_bytes(b"same\n" * 1000)
+    (tmp_path / "b.txt").write_bytes(b"same\n" * 1000)
+    (tmp_path / "crlf.txt").write_bytes(b"same\r\n" * 1000)
+    (tmp_path / "a.bin").write_bytes(b"\x00\x01" * 10)
+    (tmp_path / "b.bin").write_bytes(b"\x00\x02" * 10)
+
+    decoded = []
+    original = Path.read_text
+
+    def tracking(self, *args, **kwargs):
+        decoded.append(self.name)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "read_text", tracking)
+
+    assert _compare_files(tmp_path / "a.txt", tmp_path / "b.txt") == (True, None)
+    assert _compare_files(tmp_path / "a.bin", tmp_path / "b.bin") == (False, None)
+    assert decoded == []
+    assert _compare_files(tmp_path / "a.txt", tmp_path / "crlf.txt") == (True, None)
+    assert decoded == ["a.txt", "crlf.txt"]
+
+
+def test_verify_export_against_manifest_skips_template(tmp_path):
+    template = tmp_path / "template"
+    export = tmp_path / "export"
+    (template / "sub").mkdir(parents=True)
+    (template / "a.txt").write_text("hello\n")
+    (template / "sub" / "b.txt").write_text("world\n")
+    manifest = ExportManifest()
+    sync_tree(template, None, export, manifest)
+
+    missing = tmp_path / "missing"
+    assert verify_public_export(missing, export, expected=manifest, workers=2)
+
+    (export / "sub" / "b.txt").write_text("changed\n")
+    (export / "extra.txt").write_text("extra\n")
+    assert not verify_public_export(missing, export, expected=manifest, workers=2)
@@ -1,3 +1,4 @@
+import os
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
@@ -135,7 +136,7 @@ def test_overlay_manifest_used_when_overlay_missing(tmp_path, monkeypatch):
 
     ver = {}
 
-    def fake_verify(t_dir, e_dir, manifest=None):
+    def fake_verify(t_dir, e_dir, manifest=None, **kwargs):
         ver["manifest"] = manifest
         return True
 
@@ -163,7 +164,7 @@ def test_public_workflow_runs_verification(tmp_path, monkeypatch):
 
     captured = {}
 
-    def fake_verify(t_dir, e_dir, manifest=None):
+    def fake_verify(t_dir, e_dir, manifest=None, **kwargs):
         captured['args'] = (t_dir, e_dir, manifest)
         return True
 
@@ -172,8 +173,10 @@ def test_public_workflow_runs_verification(tmp_path, monkeypatch):
     public_dir = workflow.public_workflow(cfg)
 
     assert captured['args'][0] == template_source_dir
-    assert captured['args'][1] == public_dir
+    # Verification runs on the staged export before it is swapped in
+    assert captured['args'][1] == public_dir.with_name('public.next')
     assert captured['args'][2] is None
+    assert not public_dir.with_name('public.next').exists()
 
 
 def test_public_workflow_verification_failure(tmp_path, monkeypatch):
@@ -196,4 +199,124 @@ def test_public_workflow_verification_failure(tmp_path, monkeypatch):
 
     with pytest.raises(SystemExit):
         workflow.public_workflow(cfg)
+    assert not (working_directory / 'public').exists()
+    assert not (working_directory / 'public.next').exists()
 
+
+def test_public_workflow_keeps_previous_export(tmp_path, monkeypatch):
+    cfg = tmp_path / 'c.yaml'
+    placeholder_values = tmp_path / 'p.yaml'
+    template_source_dir = tmp_path / 'template'
+    working_directory = tmp_path / 'work'
+    template_source_dir.mkdir()
+    (template_source_dir / 'a.txt').write_text('v1')
+    placeholder_values.write_text('X: 1')
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+    )
+    monkeypatch.setattr(workflow, 'verify_public_export', lambda *a, **k: True)
+
+    public_dir = workflow.public_workflow(cfg)
+    (template_source_dir / 'a.txt').write_text('v2')
+    workflow.public_workflow(cfg)
+
+    assert (public_dir / 'a.txt').read_text() == 'v2'
+    assert (working_directory / 'public.prev' / 'a.txt').read_text() == 'v1'
+
+    # Each export's manifest moves with it
+    manifest = workflow._load_export_manifest(public_dir)
+    assert manifest.matches(public_dir, Path('a.txt'))
+    assert workflow._load_export_manifest(working_directory / 'public.prev').matches(
+        working_directory / 'public.prev', Path('a.txt')
+    )
+
+    assert workflow._restore_previous_public(public_dir)
+    assert (public_dir / 'a.txt').read_text() == 'v1'
+    assert workflow._load_export_manifest(public_dir).matches(public_dir, Path('a.txt'))
+    assert not (working_directory / 'public.prev').exists()
+    assert not workflow._restore_previous_public(public_dir)
+
+
+
+def test_remove_overlay_prunes_only_emptied_directories(tmp_path):
+    public_dir = tmp_path / 'public'
+    template = tmp_path / 'template'
+    template.mkdir()
+    (public_dir / 'a' / 'b').mkdir(parents=True)
+    (public_dir / 'a' / 'b' / 'secret.txt').write_text('s')
+    (public_dir / 'keep' / 'x').mkdir(parents=True)
+    (public_dir / 'keep' / 'x' / 'secret.txt').write_text('s')
+    (public_dir / 'keep' / 'other.txt').write_text('o')
+    (public_dir / 'untouched').mkdir()
+
+    workflow._remove_overlay(
+        public_dir,
+        template,
+        tmp_path / 'overlay',
+        [Path('a/b/secret.txt'), Path('keep/x/secret.txt'), Path('missing.txt')],
+    )
+
+    assert not (public_dir / 'a').exists()
+    assert not (public_dir / 'keep' / 'x').exists()
+    assert (public_dir / 'keep' / 'other.txt').exists()
+    # Empty directories unrelated to the overlay are left alone
+    assert (public_dir / 'untouched').is_dir()
+
+
+def test_public_swap_survives_leftover_stale_export(tmp_path, monkeypatch):
+    public_dir = tmp_path / 'public'
+    replace = os.replace
+
+    def windows_replace(src, dst):
+        # Windows cannot rename a directory onto an existing one
+        if Path(src).is_dir() and Path(dst).exists():
+            raise PermissionError(f'cannot replace {dst}')
+        replace(src, dst)
+
+    monkeypatch.setattr(workflow.os, 'replace', windows_replace)
+    for name, text in (('public', 'v1'), ('public.prev', 'v0'), ('public.next', 'v2')):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'a.txt').write_text(text)
+    # Left behind by a crash between the renames
+    (tmp_path / 'public.stale' / 'sub').mkdir(parents=True)
+    (tmp_path / 'public.stale' / 'sub' / 'old.txt').write_text('old')
+
+    workflow._swap_public_export(tmp_path / 'public.next', public_dir)
+    assert (public_dir / 'a.txt').read_text() == 'v2'
+    assert (tmp_path / 'public.prev' / 'a.txt').read_text() == 'v1'
+
+    (tmp_path / 'public.stale').mkdir()
+    (tmp_path / 'public.stale' / 'x').write_text('x')
+    assert workflow._restore_previous_public(public_dir)
+    assert (public_dir / 'a.txt').read_text() == 'v1'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['public']
+
+
+def test_public_workflow_fail_fast_keeps_outcome(tmp_path, monkeypatch, capsys):
+    cfg = tmp_path / 'c.yaml'
+    placeholder_values = tmp_path / 'p.yaml'
+    template_source_dir = tmp_path / 'template'
+    working_directory = tmp_path / 'work'
+    template_source_dir.mkdir()
+    (template_source_dir / 'a.txt').write_text('mail dev@example.org\n')
+    (template_source_dir / 'b.txt').write_text('host 10.1.2.3 holds Secret1\n')
+    placeholder_values.write_text('X: Secret1')
+    cfg.write_text(
+        f'placeholder_values: "{placeholder_values.as_posix()}"\n'
+        f'working_directory: "{working_directory.as_posix()}"\n'
+        f'template_source_dir: "{template_source_dir.as_posix()}"\n'
+    )
+
+    # Export findings are reported but do not block, with or without fail_fast
+    # and every finding is printed, not just the first
+    for fail_fast in (False, True):
+        public_dir = workflow.public_workflow(cfg, fail_fast=fail_fast)
+        assert (public_dir / 'a.txt').exists()
+        out = capsys.readouterr().out
+        # Named where the files end up, not in the staging directory
+        assert f"{public_dir / 'a.txt'}:1: Email" in out
+        assert 'public.next' not in out
+        assert 'b.txt:1: IP address' in out
+        assert 'b.txt:1: Profile value X' in out
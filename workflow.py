@@ -5,22 +5,47 @@ import subprocess
 import json
 import os
 import shutil
-from urllib import request
+import uuid
 from typing import Optional, Tuple, Set, Iterable, List, Dict
 import re
 
-from core.rollback import RollbackManager
-from scripts.apply_template_context import inject_context, load_profile
+from core.rollback import (
+    BACKENDS as ROLLBACK_BACKENDS,
+    COMPRESSIONS as ROLLBACK_COMPRESSIONS,
+    RollbackManager,
+)
+from scripts.apply_template_context import inject_context, load_profile, read_profile
 from scripts.validate_public_repo import validate_directory
-from core.constants import TEXT_EXTENSIONS, KEYWORDS
+from core.config import DEFAULT_CONFIG, load_config
+from core.constants import TEXT_EXTENSIONS
 from core.utils import is_binary_file
+from core.git_state import GitState, collect_git_state
+from core.journal import WriteJournal
+from core.keywords import keyword_matcher
+from core.history import HistoryScanner
+from core.leaks import ProfileLeakScanner
+from core.sync import ExportManifest, sync_tree
+from core.validation import (
+    IdentifierCheck,
+    PlaceholderCheck,
+    PrivateReferenceCheck,
+    ValidationCache,
+    ValidationEngine,
+)
 from scripts.manage_logs import cleanup_logs
+from scripts.precommit import content_scanner, run as run_precommit
 from scripts.verify_public_export import verify_public_export
-import yaml
+VALIDATION_CACHE = '.validation-cache.json'
 
-DEFAULT_CONFIG = Path('.workflow-config.yaml')
+_rollback: Optional[RollbackManager] = None
 
-rollback_manager = RollbackManager(Path('.'))
+
+def _rollback_manager() -> RollbackManager:
+    """Return the rollback manager, creating it (and its store) on first use."""
+    global _rollback
+    if _rollback is None:
+        _rollback = RollbackManager(Path('.'))
+    return _rollback
 
 
 class WorkflowManager:
@@ -84,30 +109,35 @@ class WorkflowManager:
         ]
         subprocess.run(cmd, check=True)
 
-def load_config(path: Path = DEFAULT_CONFIG) -> dict:
-    config = yaml.safe_load(open(path))
-
-    if "profile" in config and "placeholder_values" not in config:
-        config["placeholder_values"] = config["profile"]
-        print("Warning: 'profile' is deprecated, use 'placeholder_values' instead")
-
-    if "template" in config and "template_source_dir" not in config:
-        config["template_source_dir"] = config["template"]
-        print("Warning: 'template' is deprecated, use 'template_source_dir' instead")
-
-    if "temp_dir" in config and "working_directory" not in config:
-        config["working_directory"] = config["temp_dir"]
-        print("Warning: 'temp_dir' is deprecated, use 'working_directory' instead")
-
-    if "overlay_dir" in config and "company_only_files" not in config:
-        config["company_only_files"] = config["overlay_dir"]
-        print("Warning: 'overlay_dir' is deprecated, use 'company_only_files' instead")
-
-    return config
+def _configure_rollback(cfg: dict) -> None:
+    """Apply the optional ``rollback`` section of the config to the rollback manager."""
+    settings = cfg.get("rollback") or {}
+    backend = settings.get("backend", "blobs")
+    if backend not in ROLLBACK_BACKENDS:
+        raise SystemExit(
+            f"❌ Unknown rollback backend '{backend}' (expected one of: {', '.join(ROLLBACK_BACKENDS)})"
+        )
+    compression = settings.get("compression", "xz")
+    if compression not in ROLLBACK_COMPRESSIONS:
+        raise SystemExit(
+            f"❌ Unknown rollback compression '{compression}' (expected one of: {', '.join(ROLLBACK_COMPRESSIONS)})"
+        )
+    manager = _rollback_manager()
+    manager.backend = backend
+    manager.compression = compression
+    manager.compression_level = settings.get("level")
+    manager.max_history = int(settings.get("max_history", 5))
+    manager.max_bytes = settings.get("max_bytes")
+    manager.max_age_days = settings.get("max_age_days")
+    # Deleting expired snapshots should not hold up the workflow itself
+    manager.background_gc = bool(settings.get("background_gc", True))
 
 
 def repo_is_public(owner: str, repo: str) -> bool:
     """Return True if the GitHub repo is public."""
+    # Imported here to keep it off the start-up path of the git hook commands
+    from urllib import request
+
     url = f"https://api.github.com/repos/{owner}/{repo}"
     req = request.Request(url, method="GET")
     req.add_header("Accept", "application/vnd.github+json")
@@ -375,18 +405,11 @@ def validate_workflow_setup(config_path: Path = DEFAULT_CONFIG) -> bool:
     if changed and gitignore.exists():
         gitignore.write_text("\n".join(gitignore_lines) + "\n", encoding="utf-8")
 
-    if company_only_files.exists() and Path(".git").exists():
-        res = subprocess.run(
-            ["git", "ls-files", str(company_only_files)], capture_output=True, text=True
-        )
-        if res.stdout.strip():
-            errors.append("Company-only files directory appears tracked by git")
-    if placeholder_values_path.exists() and Path(".git").exists():
-        res = subprocess.run(
-            ["git", "ls-files", str(placeholder_values_path)], capture_output=True, text=True
-        )
-        if res.stdout.strip():
-            errors.append("Placeholder values file appears tracked by git")
+    git_state = collect_git_state(Path(".")) if Path(".git").exists() else None
+    if company_only_files.exists() and git_state and git_state.is_tracked(company_only_files):
+        errors.append("Company-only files directory appears tracked by git")
+    if placeholder_values_path.exists() and git_state and git_state.is_tracked(placeholder_values_path):
+        errors.append("Placeholder values file appears tracked by git")
 
     if errors:
         print("❌ ERRORS (must fix):")
@@ -402,9 +425,23 @@ def validate_workflow_setup(config_path: Path = DEFAULT_CONFIG) -> bool:
     return not errors
 
 
-def validate_before_workflow(config_path: Path, operation: str) -> Tuple[bool, List[str], List[str]]:
+def validate_before_workflow(
+    config_path: Path,
+    operation: str,
+    *,
+    git_state: Optional[GitState] = None,
+    use_cache: bool = False,
+    fail_fast: bool = False,
+) -> Tuple[bool, List[str], List[str]]:
     """Validate before running workflow.
 
+    ``git_state`` lets the caller share one :func:`collect_git_state` result
+    across the whole invocation. With ``use_cache`` template findings are
+    reused from ``<working_directory>/.validation-cache.json`` for files that
+    did not change, unless ``validation.cache`` is false in the config.
+    ``fail_fast`` returns as soon as an error is known and scans the most
+    recently modified template files first.
+
     Returns: (is_valid, errors, warnings)
     """
     errors: List[str] = []
@@ -444,116 +481,65 @@ def validate_before_workflow(config_path: Path, operation: str) -> Tuple[bool, L
     except Exception:
         pass
 
-    placeholder_styles: Set[str] = set()
-    placeholders: Set[str] = set()
-    placeholder_map: Dict[str, List[Tuple[str, int]]] = {}
-    if template.exists():
-        for root, _, files in os.walk(template):
-            for name in files:
-                path = Path(root) / name
-                if path.is_symlink():
-                    try:
-                        path = path.resolve(strict=True)
-                    except FileNotFoundError:
-                        continue
-                if is_binary_file(path):
-                    try:
-                        data = path.read_bytes()
-                    except Exception:
-                        data = b""
-                    if b"{{" in data and b"}}" in data:
-                        errors.append(f"Placeholder found in binary file: {path}")
-                    continue
-                try:
-                    text = path.read_text(encoding="utf-8", errors="ignore")
-                except Exception:
-                    continue
-                if "{{ {{" in text:
-                    errors.append(f"Nested placeholder found in {path}")
-                for lineno, line in enumerate(text.splitlines(), 1):
-                    for m in re.finditer(r"\{\{\s*([A-Za-z0-9_]+)\s*\}\}", line):
-                        key = m.group(1)
-                        placeholders.add(key)
-                        placeholder_styles.add(m.group(0).replace(key, "KEY"))
-                        placeholder_map.setdefault(key, []).append((str(path), lineno))
-                        if not re.fullmatch(r"[A-Z0-9_]+", key):
-                            warnings.append(
-                                f"Inconsistent placeholder '{key}' in {path}"
-                            )
-        if len(placeholder_styles) > 1:
-            warnings.append("Inconsistent placeholder style used in template")
-
     profile_data: Dict[str, str] = {}
+    profile_errors: List[str] = []
+    profile_warnings: List[str] = []
     if placeholder_values_path.exists():
         try:
             profile_data = load_profile(placeholder_values_path)
         except Exception as exc:
-            errors.append(str(exc))
+            profile_errors.append(str(exc))
         else:
             for key, val in profile_data.items():
                 if isinstance(val, str) and re.search(r"\{\{.*\}\}", val):
-                    errors.append(f"Placeholder values for {key} contains placeholder syntax")
+                    profile_errors.append(f"Placeholder values for {key} contains placeholder syntax")
                 if not isinstance(val, str):
-                    warnings.append(f"Value for {key} converted to string")
+                    profile_warnings.append(f"Value for {key} converted to string")
 
-    # Add validation for placeholders in identifiers
-    identifier_errors = []
-    if template.exists() and placeholder_values_path.exists():
-        class_def = re.compile(r'^\s*class\s+([^(:]+)', re.MULTILINE)
-        func_def = re.compile(r'^\s*(?:async\s+)?def\s+([^(:]+)', re.MULTILINE)
-        placeholder_pat = re.compile(r'\{\{\s*([A-Za-z0-9_]+)\s*\}\}')
-
-        for root, _, files in os.walk(template):
-            for name in files:
-                path = Path(root) / name
-                if path.suffix in {'.py', '.pyx', '.pyi'}:  # Python files
-                    try:
-                        text = path.read_text(encoding="utf-8")
-                    except Exception:
-                        continue
-
-                    # Check class definitions
-                    for m in class_def.finditer(text):
-                        ident = m.group(1)
-                        for ph in placeholder_pat.finditer(ident):
-                            key = ph.group(1)
-                            if key not in profile_data:
-                                continue
-                            value = str(profile_data[key])
-                            if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', value.replace(' ', '')):
-                                identifier_errors.append(
-                                    f"{path}: Placeholder '{key}' in class name contains invalid identifier value: '{value}'"
-                                )
-                            elif ' ' in value:
-                                warnings.append(
-                                    f"{path}: Placeholder '{key}' in class name contains spaces: '{value}' - consider using a separate identifier key"
-                                )
-
-                    # Check function definitions
-                    for m in func_def.finditer(text):
-                        ident = m.group(1)
-                        for ph in placeholder_pat.finditer(ident):
-                            key = ph.group(1)
-                            if key not in profile_data:
-                                continue
-                            value = str(profile_data[key])
-                            if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', value.replace(' ', '')):
-                                identifier_errors.append(
-                                    f"{path}: Placeholder '{key}' in def name contains invalid identifier value: '{value}'"
-                                )
-                            elif ' ' in value:
-                                warnings.append(
-                                    f"{path}: Placeholder '{key}' in def name contains spaces: '{value}' - consider using a separate identifier key"
-                                )
-
-    errors.extend(identifier_errors)
+    if fail_fast and (errors or profile_errors):
+        return False, errors + profile_errors, warnings + profile_warnings
 
+    # Every template check shares one read of each file
+    placeholder_check = PlaceholderCheck()
+    identifier_check = IdentifierCheck(profile_data)
+    private_check = PrivateReferenceCheck(matcher=keyword_matcher(cfg))
+    if template.exists():
+        engine = ValidationEngine([placeholder_check])
+        if placeholder_values_path.exists():
+            engine.register(identifier_check)
+        engine.register(private_check)
+        validation_cfg = cfg.get("validation") or {}
+        cache = None
+        if use_cache and validation_cfg.get("cache", True):
+            size = validation_cfg.get("cache_size", 10000)
+            if isinstance(size, int) and not isinstance(size, bool) and size > 0:
+                cache = ValidationCache(working_directory / VALIDATION_CACHE, max_entries=size)
+            else:
+                errors.append("validation.cache_size must be a positive integer")
+        engine.run(template, cache, fail_fast=fail_fast)
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError:
+                # The cache is only an optimisation
+                pass
+
+    errors.extend(placeholder_check.errors)
+    warnings.extend(placeholder_check.warnings)
+    if len(placeholder_check.styles) > 1:
+        warnings.append("Inconsistent placeholder style used in template")
+    errors.extend(profile_errors)
+    warnings.extend(profile_warnings)
+    errors.extend(identifier_check.errors)
+    warnings.extend(identifier_check.warnings)
+
+    placeholders = placeholder_check.placeholders
     if placeholders:
         missing = placeholders - set(profile_data.keys())
         if missing:
             details = []
             for key in sorted(missing):
-                locs = placeholder_map.get(key, [])
+                locs = placeholder_check.locations.get(key, [])
                 loc_str = "; ".join(f"{p}:{ln}" for p, ln in locs)
                 if loc_str:
                     details.append(f"{key} ({loc_str})")
@@ -570,21 +556,18 @@ def validate_before_workflow(config_path: Path, operation: str) -> Tuple[bool, L
     else:
         warnings.append(".gitignore not found")
 
-    if template.exists():
-        private_msg = _find_private_references(template)
-        if private_msg:
-            errors.append(private_msg)
+    private_msg = _format_private_references(private_check.hits)
+    if private_msg:
+        errors.append(private_msg)
+    if fail_fast and errors:
+        return False, errors, warnings
 
-    if company_only_files.exists() and Path(".git").exists():
-        res = subprocess.run(
-            ["git", "ls-files", str(company_only_files)], capture_output=True, text=True
-        )
-        if res.stdout.strip():
+    if git_state is None and Path(".git").exists():
+        git_state = collect_git_state(Path("."))
+    if git_state is not None:
+        if company_only_files.exists() and git_state.is_tracked(company_only_files):
             errors.append("Company-only files directory appears tracked by git")
-
-    if Path(".git").exists():
-        res = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True)
-        if res.stdout.strip():
+        if git_state.has_changes:
             warnings.append("Git repository has uncommitted changes")
 
     return not errors, errors, warnings
@@ -594,8 +577,12 @@ def private_workflow(
     config_path: Path = DEFAULT_CONFIG,
     *,
     dry_run: bool = False,
+    fail_fast: bool = False,
 ) -> Path:
-    valid, errors, warnings = validate_before_workflow(config_path, "private")
+    git_state = collect_git_state(Path(".")) if Path(".git").exists() else None
+    valid, errors, warnings = validate_before_workflow(
+        config_path, "private", git_state=git_state, use_cache=True, fail_fast=fail_fast
+    )
     if not valid:
         for e in errors:
             print(f"❌ {e}")
@@ -604,6 +591,7 @@ def private_workflow(
         raise SystemExit("❌ Workflow validation failed")
 
     cfg = load_config(config_path)
+    _configure_rollback(cfg)
     working_directory = Path(cfg.get('working_directory', '.workflow-temp'))
     template_source_dir = Path(cfg.get('template_source_dir', 'template'))
     placeholder_values = Path(
@@ -615,18 +603,35 @@ def private_workflow(
         raise SystemExit('❌ Profile validation failed')
     rollback_id = None
     if not dry_run:
-        rollback_id = rollback_manager.create_snapshot('to_private', cfg)
+        journal_path = working_directory / '.private.journal'
+        undone = WriteJournal.recover(journal_path)
+        if undone:
+            print(f"⚠️  Undid {undone} write{'s' if undone != 1 else ''} left by an interrupted run")
+        # The journal makes every write undoable; a full snapshot is optional
+        if (cfg.get('rollback') or {}).get('snapshot', True):
+            # inject_context writes ``dst`` and may auto-fix the profile in place
+            rollback_id = _rollback_manager().create_snapshot(
+                'to_private', cfg, paths=[dst, placeholder_values]
+            )
+        journal = WriteJournal(journal_path)
         try:
-            inject_context(template_source_dir, dst, placeholder_values, company_only_files)
+            inject_context(
+                template_source_dir, dst, placeholder_values, company_only_files, journal=journal
+            )
             if company_only_files.exists():
-                _write_overlay_manifest(company_only_files, dst)
+                _write_overlay_manifest(company_only_files, dst, journal)
         except Exception:
-            rollback_manager.rollback_to(rollback_id)
+            journal.rollback()
+            if rollback_id:
+                _rollback_manager().rollback_to(rollback_id)
             raise
+        journal.commit()
     return dst
 
 
-def _write_overlay_manifest(company_only_files_dir: Path, target_dir: Path) -> None:
+def _write_overlay_manifest(
+    company_only_files_dir: Path, target_dir: Path, journal: Optional[WriteJournal] = None
+) -> None:
     """Write list of company-only files relative to ``target_dir``."""
     manifest = target_dir / ".overlay_manifest"
     lines = []
@@ -635,7 +640,10 @@ def _write_overlay_manifest(company_only_files_dir: Path, target_dir: Path) -> N
             rel = Path(root) / name
             rel = rel.relative_to(company_only_files_dir)
             lines.append(str(rel))
-    manifest.write_text("\n".join(lines), encoding="utf-8")
+    if journal is not None:
+        journal.write_text(manifest, "\n".join(lines))
+    else:
+        manifest.write_text("\n".join(lines), encoding="utf-8")
 
 
 def _read_overlay_manifest(private_dir: Path) -> Optional[List[Path]]:
@@ -646,6 +654,15 @@ def _read_overlay_manifest(private_dir: Path) -> Optional[List[Path]]:
     return [Path(line) for line in lines]
 
 
+def _overlay_entries(company_only_files: Path) -> List[Path]:
+    entries = []
+    for root, _, files in os.walk(company_only_files):
+        for name in files:
+            rel = Path(root) / name
+            entries.append(rel.relative_to(company_only_files))
+    return entries
+
+
 def _remove_overlay(
     public_dir: Path,
     template: Path,
@@ -656,13 +673,9 @@ def _remove_overlay(
     if overlay_files is None:
         if not company_only_files.exists():
             return
-        overlay_files = []
-        for root, _, files in os.walk(company_only_files):
-            for name in files:
-                rel = Path(root) / name
-                rel = rel.relative_to(company_only_files)
-                overlay_files.append(rel)
+        overlay_files = _overlay_entries(company_only_files)
 
+    removed_parents: Set[Path] = set()
     for rel in overlay_files:
         target = public_dir / rel
         template_file = template / rel
@@ -682,35 +695,24 @@ def _remove_overlay(
                 shutil.rmtree(target)
             elif target.exists() or target.is_symlink():
                 target.unlink()
-
-    # Clean up empty directories that came from the overlay
-    for root, dirs, files in os.walk(public_dir, topdown=False):
-        path = Path(root)
-        try:
-            next(path.iterdir())
-        except StopIteration:
-            path.rmdir()
-
-
-def _find_private_references(template_dir: Path) -> Optional[str]:
-    """Return formatted error message if private keywords are found."""
-
-    hits: Dict[str, List[Tuple[int, str, str]]] = {}
-    for f in template_dir.rglob("*"):
-        if not f.is_file() or is_binary_file(f):
-            continue
-        try:
-            lines = f.read_text(encoding="utf-8", errors="ignore").splitlines()
-        except Exception:
-            continue
-        for idx, line in enumerate(lines, 1):
-            for kw in KEYWORDS:
-                if kw.lower() in line.lower():
-                    info = hits.setdefault(str(f), [])
-                    if len(info) < 3:
-                        info.append((idx, line, kw))
-                    break
-
+            else:
+                continue
+            removed_parents.add(target.parent)
+
+    # Clean up directories the removals left empty, deepest first, stopping
+    # at the first ancestor that still has content
+    pruned: Set[Path] = set()
+    for parent in sorted(removed_parents, key=lambda p: len(p.parts), reverse=True):
+        while parent != public_dir and parent not in pruned and public_dir in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            pruned.add(parent)
+            parent = parent.parent
+
+
+def _format_private_references(hits: Dict[str, List[Tuple[int, str, str]]]) -> Optional[str]:
     if not hits:
         return None
 
@@ -737,8 +739,12 @@ def public_workflow(
     config_path: Path = DEFAULT_CONFIG,
     *,
     dry_run: bool = False,
+    fail_fast: bool = False,
 ) -> Path:
-    valid, errors, warnings = validate_before_workflow(config_path, "public")
+    git_state = collect_git_state(Path(".")) if Path(".git").exists() else None
+    valid, errors, warnings = validate_before_workflow(
+        config_path, "public", git_state=git_state, use_cache=True, fail_fast=fail_fast
+    )
     if not valid:
         for e in errors:
             print(f"❌ {e}")
@@ -747,76 +753,276 @@ def public_workflow(
         raise SystemExit("❌ Workflow validation failed")
 
     cfg = load_config(config_path)
+    _configure_rollback(cfg)
     working_directory = Path(cfg.get('working_directory', '.workflow-temp'))
     template_source_dir = Path(cfg.get('template_source_dir', 'template'))
     company_only_files = Path(cfg.get('company_only_files', 'private-overlay'))
     public_dir = working_directory / 'public'
     private_dir = working_directory / 'private'
 
-    rollback_id = None
     if not dry_run:
-        rollback_id = rollback_manager.create_snapshot('to_public', cfg)
+        # Build the new export beside the current one so readers never see a
+        # half-built tree; a failure leaves ``public_dir`` untouched.
+        staging = public_dir.with_name(public_dir.name + '.next')
+        if staging.exists():
+            shutil.rmtree(staging)
         try:
-            if public_dir.exists():
-                shutil.rmtree(public_dir)
-            shutil.copytree(template_source_dir, public_dir, symlinks=True)
+            # Unchanged files are hard-linked from the current export, so
+            # their mtimes survive; overlay entries only need work if the sync
+            # touched them or they must stay out of the export
+            # The manifest records what the export should hold while it is
+            # built, so verification need not read the template again
+            manifest = ExportManifest()
+            changed = set(
+                sync_tree(
+                    template_source_dir,
+                    public_dir,
+                    staging,
+                    manifest,
+                    _load_export_manifest(public_dir),
+                )
+            )
             overlay_files = _read_overlay_manifest(private_dir)
-            _remove_overlay(public_dir, template_source_dir, company_only_files, overlay_files)
-            validate_directory(public_dir)
+            if overlay_files is not None:
+                entries = overlay_files
+            elif company_only_files.exists():
+                entries = _overlay_entries(company_only_files)
+            else:
+                entries = []
+            _remove_overlay(
+                staging,
+                template_source_dir,
+                company_only_files,
+                [p for p in entries if p in changed or not (template_source_dir / p).exists()],
+            )
+            # The next run links from this tree and rollback restores it, so
+            # both need to tell whether its files were written to in place
+            manifest.record_stats(staging)
+            manifest.save(_manifest_path(staging))
+            # Findings in the export are advisory, so ``fail_fast`` does not
+            # apply: stopping early would only hide later ones
+            # Name findings by where the files will be once swapped in
+            validate_directory(staging, workers=_validation_workers(cfg), label=public_dir)
+            placeholder_values = Path(
+                cfg.get('placeholder_values', 'scripts/config_profiles/company_profile.yaml')
+            )
+            scanner = ProfileLeakScanner(read_profile(placeholder_values))
+            scanner.scan_directory(staging, label=public_dir)
             verify_files = (
                 [p for p in overlay_files if not (template_source_dir / p).exists()]
                 if overlay_files
                 else None
             )
-            if not verify_public_export(template_source_dir, public_dir, verify_files):
+            if not verify_public_export(
+                template_source_dir,
+                staging,
+                verify_files,
+                fail_fast=fail_fast,
+                expected=manifest,
+                workers=_validation_workers(cfg),
+                matcher=keyword_matcher(cfg),
+            ):
                 raise SystemExit('❌ Public export verification failed')
-        except Exception:
-            rollback_manager.rollback_to(rollback_id)
+        except BaseException:
+            _discard_export(staging)
             raise
+        _swap_public_export(staging, public_dir)
     return public_dir
 
 
+def _validation_workers(cfg: dict) -> int:
+    workers = (cfg.get('validation') or {}).get('workers', 1)
+    if workers == 'auto':
+        return os.cpu_count() or 1
+    if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+        raise SystemExit("❌ validation.workers must be a positive integer or 'auto'")
+    return workers
+
+
+def _manifest_path(export_dir: Path) -> Path:
+    """Return where the manifest of ``export_dir`` lives, beside (not in) it."""
+    return export_dir.with_name(export_dir.name + '.manifest.json')
+
+
+def _load_export_manifest(export_dir: Path) -> Optional[ExportManifest]:
+    try:
+        return ExportManifest.load(_manifest_path(export_dir))
+    except (OSError, ValueError):
+        return None
+
+
+def _move_export(src: Path, dst: Path) -> None:
+    """Rename export ``src`` to ``dst`` together with its manifest."""
+    os.replace(src, dst)
+    manifest = _manifest_path(src)
+    if manifest.exists():
+        os.replace(manifest, _manifest_path(dst))
+    else:
+        _manifest_path(dst).unlink(missing_ok=True)
+
+
+def _discard_export(export_dir: Path) -> None:
+    shutil.rmtree(export_dir, ignore_errors=True)
+    _manifest_path(export_dir).unlink(missing_ok=True)
+
+
+def _stale_export(public_dir: Path) -> Path:
+    """Return an unused name to rename an outgoing export to.
+
+    Leftovers of earlier runs that crashed or failed to delete them are
+    removed first; the unique name means one that survives cannot block the
+    next rename. Nothing exists at the name, since renaming a directory onto
+    an existing one fails on Windows.
+    """
+    for leftover in public_dir.parent.glob(public_dir.name + '.stale*'):
+        if leftover.is_dir() and not leftover.is_symlink():
+            _discard_export(leftover)
+    return public_dir.with_name(f'{public_dir.name}.stale-{uuid.uuid4().hex}')
+
+
+def _swap_public_export(staging: Path, public_dir: Path) -> None:
+    """Move ``staging`` into place, keeping the current export as ``<name>.prev``."""
+    prev = public_dir.with_name(public_dir.name + '.prev')
+    stale = _stale_export(public_dir)
+    if prev.exists():
+        _move_export(prev, stale)
+    if public_dir.exists():
+        _move_export(public_dir, prev)
+    _move_export(staging, public_dir)
+    # Deleting the old generation happens after the new one is visible
+    _discard_export(stale)
+
+
+def _restore_previous_public(public_dir: Path) -> bool:
+    """Swap the ``<name>.prev`` export back into place with two renames.
+
+    ``<name>.prev`` shares hard-linked files with the export built after it,
+    so it is refused if any of them were written to since it was built.
+    """
+    prev = public_dir.with_name(public_dir.name + '.prev')
+    if not prev.exists():
+        return False
+    manifest = _load_export_manifest(prev)
+    modified = manifest.modified(prev) if manifest is not None else []
+    if modified:
+        for rel in modified:
+            print(f"  {rel}")
+        raise SystemExit(
+            f"❌ Previous public export changed since it was built ({len(modified)} file{'s' if len(modified) != 1 else ''})"
+        )
+    stale = _stale_export(public_dir)
+    if public_dir.exists():
+        _move_export(public_dir, stale)
+    _move_export(prev, public_dir)
+    _discard_export(stale)
+    return True
+
+
 def _rollback_cli(args: argparse.Namespace) -> None:
+    if args.action == "gc":
+        manager = _rollback_manager()
+        if args.config.exists():
+            _configure_rollback(load_config(args.config))
+            manager.background_gc = False
+            manager.cleanup_old_snapshots()
+        removed = manager.collect_garbage(args.limit)
+        print(f"Removed {removed} unreferenced snapshot entr{'ies' if removed != 1 else 'y'}")
+        return
+
+    if args.public:
+        cfg = load_config(args.config) if args.config.exists() else {}
+        public_dir = Path(cfg.get('working_directory', '.workflow-temp')) / 'public'
+        if _restore_previous_public(public_dir):
+            print(f"Restored previous public export in {public_dir}")
+        else:
+            print("No previous public export found")
+        return
+
     if args.list:
-        for snap in rollback_manager.list_snapshots():
+        for snap in _rollback_manager().list_snapshots():
             print(f"{snap['timestamp']} - {snap.get('operation', '')}")
         return
 
     snapshot_id = None
     if args.to:
         snapshot_id = args.to
-    elif args.steps is not None:
-        snaps = rollback_manager.list_snapshots()
-        if len(snaps) > args.steps:
-            snapshot_id = snaps[args.steps].get("timestamp")
     else:
-        snaps = rollback_manager.list_snapshots()
-        if snaps:
-            snapshot_id = snaps[0]["timestamp"]
+        snap = _rollback_manager().get_snapshot(args.steps or 0)
+        if snap:
+            snapshot_id = snap.get("timestamp")
 
     if not snapshot_id:
         print("No snapshot found")
         return
-    if rollback_manager.rollback_to(snapshot_id, dry_run=args.dry_run):
+    if args.verify:
+        corrupted = _rollback_manager().verify_contents(snapshot_id, workers=args.workers)
+        for rel in corrupted:
+            print(f"\u2717 Corrupted: {rel}")
+        if corrupted:
+            raise SystemExit(f"❌ Snapshot {snapshot_id} failed verification")
+        print(f"\u2713 Snapshot {snapshot_id} verified")
+        return
+    if _rollback_manager().rollback_to(snapshot_id, dry_run=args.dry_run):
         print(f"Rolled back to {snapshot_id}")
     else:
         print("Rollback failed")
 
 
+def _scan_history_cli(args: argparse.Namespace) -> None:
+    cfg = load_config(args.config) if args.config.exists() else {}
+    scan, fp = content_scanner(cfg)
+    git_dir = subprocess.run(
+        ["git", "rev-parse", "--absolute-git-dir"],
+        cwd=args.repo,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if git_dir.returncode != 0:
+        raise SystemExit(f"❌ Not a git repository: {args.repo}")
+    state = Path(git_dir.stdout.strip()) / 'workflow-history-scan.json'
+    scanner = HistoryScanner(Path(args.repo), scan, fp, state)
+    try:
+        commits, blobs, findings = scanner.run(args.rev, full=args.full)
+    except RuntimeError as exc:
+        raise SystemExit(f"❌ {exc}")
+    for line in findings:
+        print(line)
+    print(f"Scanned {commits} new commit{'s' if commits != 1 else ''}, {blobs} new blob{'s' if blobs != 1 else ''}")
+    if findings:
+        raise SystemExit(f"❌ Found {len(findings)} sensitive line{'s' if len(findings) != 1 else ''} in history")
+
+
+def _precommit_cli(args: argparse.Namespace) -> None:
+    run_precommit(args.repo, args.config)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Workflow helper")
     sub = parser.add_subparsers(dest="command", required=True)
     sub.add_parser("private")
     sub.add_parser("public")
     roll = sub.add_parser("rollback")
+    roll.add_argument("action", nargs="?", choices=["gc"], help="Collect expired snapshots")
+    roll.add_argument("--limit", type=int, help="Maximum entries removed by gc")
     roll.add_argument("--list", action="store_true")
     roll.add_argument("--to", type=str)
     roll.add_argument("--steps", type=int)
     roll.add_argument("--dry-run", action="store_true")
+    roll.add_argument("--public", action="store_true", help="Swap the previous public export back into place")
+    roll.add_argument("--verify", action="store_true", help="Re-hash snapshot contents instead of restoring")
+    roll.add_argument("--workers", type=int, help="Threads used by --verify")
+    hist = sub.add_parser("scan-history", help="Scan git history for sensitive content")
+    hist.add_argument("--repo", type=Path, default=Path("."), help="Repository to scan")
+    hist.add_argument("--rev", default="HEAD", help="Scan commits reachable from this revision")
+    hist.add_argument("--full", action="store_true", help="Ignore the checkpoint and rescan everything")
+    pre = sub.add_parser("precommit", help="Scan staged files, for use as a git pre-commit hook")
+    pre.add_argument("--repo", type=Path, default=Path("."), help="Repository whose index is scanned")
     sub.add_parser("clean-logs", help="Clean up old log files")
     sub.add_parser("status", help="Show repository visibility")
     parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG)
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first blocking error")
     args = parser.parse_args()
 
     def ensure_config(path: Path) -> None:
@@ -825,12 +1031,16 @@ def main() -> None:
 
     if args.command == "private":
         ensure_config(args.config)
-        private_workflow(args.config, dry_run=args.dry_run)
+        private_workflow(args.config, dry_run=args.dry_run, fail_fast=args.fail_fast)
     elif args.command == "public":
         ensure_config(args.config)
-        public_workflow(args.config, dry_run=args.dry_run)
+        public_workflow(args.config, dry_run=args.dry_run, fail_fast=args.fail_fast)
     elif args.command == "rollback":
         _rollback_cli(args)
+    elif args.command == "scan-history":
+        _scan_history_cli(args)
+    elif args.command == "precommit":
+        _precommit_cli(args)
     elif args.command == "clean-logs":
         cleanup_logs(Path("log"), 30)
     elif args.command == "status":